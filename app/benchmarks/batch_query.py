@@ -0,0 +1,76 @@
+"""
+Throughput of /query/batch against the same questions sent one by one to /query.
+
+Needs a running server. Run from the `app/` directory:
+
+    python -m benchmarks.batch_query --url http://localhost:8000 --questions questions.json
+
+`questions.json` is a list of question strings (or QueryRequest objects).
+"""
+import argparse
+import json
+import time
+
+import httpx
+
+
+def load_questions(path: str, document_id: str = None):
+    with open(path) as f:
+        raw = json.load(f)
+    return [
+        {"text": q, "document_id": document_id} if isinstance(q, str) else q
+        for q in raw
+    ]
+
+
+def run_serial(client: httpx.Client, url: str, questions):
+    # /query always enhances and generates; --no-generate only affects the batch run
+    errors = 0
+    started = time.perf_counter()
+    for question in questions:
+        body = client.post(f"{url}/query", json=question).json()
+        errors += body.get("status") != 200
+    return time.perf_counter() - started, errors
+
+
+def run_batch(client: httpx.Client, url: str, questions, generate: bool):
+    started = time.perf_counter()
+    body = client.post(
+        f"{url}/query/batch",
+        json={"queries": questions, "enhance": True, "generate": generate},
+    ).json()
+    elapsed = time.perf_counter() - started
+    if body.get("status") != 200:
+        raise SystemExit(f"Batch query failed: {body.get('error')}")
+    errors = sum(item["status"] != 200 for item in body["data"]["results"])
+    return elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial /query calls with one /query/batch call.")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--questions", required=True, help="JSON file with the questions to send")
+    parser.add_argument("--document-id", help="Restrict plain-string questions to this document")
+    parser.add_argument("--no-generate", action="store_true", help="Skip answer generation in the batch run")
+    parser.add_argument("--skip-serial", action="store_true", help="Only time the batch endpoint")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions, args.document_id)
+    unique = len({(q["text"], q.get("document_id")) for q in questions})
+    print(f"{len(questions)} questions ({unique} unique)")
+
+    with httpx.Client(timeout=None) as client:
+        results = {}
+        if not args.skip_serial:
+            results["serial /query"] = run_serial(client, args.url, questions)
+        results["/query/batch"] = run_batch(client, args.url, questions, not args.no_generate)
+
+    print(f"{'mode':>14} | {'seconds':>8} | {'queries/s':>9} | {'errors':>6}")
+    for mode, (seconds, errors) in results.items():
+        print(f"{mode:>14} | {seconds:>8.2f} | {len(questions) / seconds:>9.2f} | {errors:>6}")
+    if len(results) == 2:
+        print(f"speedup x{results['serial /query'][0] / results['/query/batch'][0]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
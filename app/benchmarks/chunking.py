@@ -0,0 +1,129 @@
+"""
+Ingestion memory/throughput benchmark: offset-based chunks vs. the previous
+dict-per-page / string-per-chunk representation.
+
+Both paths start from the same synthetic extracted pages and end when every
+chunk has been serialized into Weaviate properties, as the batch writer does.
+
+Run from the `app/` directory:
+
+    python -m benchmarks.chunking --pages 2000 --page-chars 4000
+"""
+import argparse
+import random
+import string
+import time
+import tracemalloc
+from typing import Dict, List
+
+import weaviate.classes as wvc
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+from services.chunking import PageBufferBuilder, split_into_chunks
+
+FILE_TYPE = "application/pdf"
+DOC_ID = "benchmark"
+
+
+def synthetic_blocks(pages: int, page_chars: int, seed: int = 0) -> List[List[str]]:
+    """
+    Generate text blocks per page, roughly like PyMuPDF's `get_text("blocks")`.
+    """
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(5000)]
+    result = []
+    for _ in range(pages):
+        blocks, size = [], 0
+        while size < page_chars:
+            block = " ".join(rng.choices(words, k=40))
+            blocks.append(block)
+            size += len(block) + 1
+        result.append(blocks)
+    return result
+
+
+def legacy_path(pages: List[List[str]]) -> int:
+    """
+    The previous implementation: concatenated page strings in dicts, then a
+    copied string and dict per chunk wrapped in a DataObject.
+    """
+    extracted_data = []
+    for page_no, blocks in enumerate(pages, start=1):
+        formatted_blocks = ''
+        for block in blocks:
+            formatted_blocks = formatted_blocks + '\n' + block
+        extracted_data.append({"page_no": str(page_no + 1), "is_image": False, "image": None, "text": formatted_blocks})
+    extracted_data.sort(key=lambda x: (int(x["page_no"]), x["is_image"]))
+
+    chunks = []
+    chunk_id = 0
+    for item in extracted_data:
+        text = item["text"]
+        start = 0
+        while start < len(text):
+            end = min(start + CHUNK_SIZE, len(text))
+            chunks.append(wvc.data.DataObject(properties={
+                "docId": DOC_ID,
+                "pageNo": str(item["page_no"]),
+                "chunkId": str(chunk_id),
+                "chunkDataType": "image" if item["is_image"] else "text",
+                "chunkData": text[start:end],
+                "fileType": FILE_TYPE,
+            }))
+            chunk_id += 1
+            start += CHUNK_SIZE - CHUNK_OVERLAP
+
+    return sum(len(chunk.properties["chunkData"]) for chunk in chunks)
+
+
+def compact_path(pages: List[List[str]]) -> int:
+    """
+    The current implementation: one page buffer plus chunk offset arrays, with
+    properties serialized one chunk at a time.
+    """
+    builder = PageBufferBuilder()
+    for page_no, blocks in enumerate(pages, start=1):
+        builder.add(page_no + 1, '\n' + '\n'.join(blocks))
+    chunks = split_into_chunks(builder.build(), FILE_TYPE, DOC_ID)
+
+    return sum(len(properties["chunkData"]) for properties in chunks)
+
+
+def measure(fn, pages, repeat: int) -> Dict:
+    tracemalloc.start()
+    fn(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chars = fn(pages)
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    return {"peak_mb": peak / 2**20, "seconds": best, "chars": chars, "mchars_per_s": chars / best / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunk representations during ingestion.")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--page-chars", type=int, default=4000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = synthetic_blocks(args.pages, args.page_chars)
+    text_mb = sum(len(block) + 1 for blocks in pages for block in blocks) / 2**20
+    print(f"{args.pages} pages, {text_mb:.1f} MB of text, chunk size {CHUNK_SIZE}, overlap {CHUNK_OVERLAP}")
+
+    results = {"legacy": measure(legacy_path, pages, args.repeat), "compact": measure(compact_path, pages, args.repeat)}
+    assert results["legacy"]["chars"] == results["compact"]["chars"], "paths produced different chunk text"
+
+    print(f"{'path':>8} | {'peak MB':>8} | {'seconds':>8} | {'Mchar/s':>8}")
+    for name, r in results.items():
+        print(f"{name:>8} | {r['peak_mb']:>8.1f} | {r['seconds']:>8.3f} | {r['mchars_per_s']:>8.1f}")
+    print(f"peak memory x{results['legacy']['peak_mb'] / results['compact']['peak_mb']:.1f} lower, "
+          f"throughput x{results['legacy']['seconds'] / results['compact']['seconds']:.1f} higher")
+
+
+if __name__ == "__main__":
+    main()
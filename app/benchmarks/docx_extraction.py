@@ -0,0 +1,112 @@
+"""
+DOCX extraction benchmark on a generated, image-heavy Word file.
+
+Compares the single-pass extractor with the previous approach of scanning every
+relationship of the document for each graphic, counting time and the number of
+images that would be sent to Azure OCR (two API calls each: OCR and caption).
+
+Run from the `app/` directory:
+
+    python -m benchmarks.docx_extraction --graphics 400 --distinct-images 40
+"""
+import argparse
+import io
+import random
+import time
+
+from PIL import Image, ImageDraw
+from docx import Document as DocxDocument
+from docx.enum.text import WD_BREAK
+from docx.oxml.ns import qn
+from docx.shared import Inches
+
+from services.chunking import PageBufferBuilder
+from services.docx_reader import extract_docx
+
+
+def generate_docx(graphics: int, distinct_images: int, seed: int = 0) -> bytes:
+    """
+    Build a DOCX with `graphics` inline pictures drawn from `distinct_images`
+    different images, plus paragraphs, page breaks and a table every few pages.
+    """
+    rng = random.Random(seed)
+    images = []
+    for i in range(distinct_images):
+        image = Image.new("RGB", (400, 300), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        ImageDraw.Draw(image).text((20, 20), f"Figure {i}", fill=(0, 0, 0))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+
+    doc = DocxDocument()
+    for i in range(graphics):
+        doc.add_paragraph(f"Paragraph {i} describing figure {i % distinct_images}. " * 5)
+        doc.add_picture(io.BytesIO(images[i % distinct_images]), width=Inches(2))
+        if i % 10 == 9:
+            doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+        if i % 50 == 49:
+            table = doc.add_table(rows=4, cols=3)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"r{r}c{c}"
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def legacy_extract(file_content: bytes) -> int:
+    """
+    The previous approach: for each graphic, walk all relationships and queue
+    every image found. Returns the number of images queued for OCR.
+    """
+    doc = DocxDocument(io.BytesIO(file_content))
+    texts, queued = [], 0
+    for element in doc.element.body.iter(qn("w:p"), qn("a:graphic")):
+        if element.tag == qn("w:p"):
+            texts.append("".join(t.text or "" for t in element.iter(qn("w:t"))).strip())
+        else:
+            for rel in doc.part.rels:
+                if "image" in doc.part.rels[rel].target_ref:
+                    image = Image.open(io.BytesIO(doc.part.rels[rel].target_part.blob))
+                    if image.size[0] > 250 and image.size[1] > 250:
+                        queued += 1
+    return queued
+
+
+def single_pass_extract(file_content: bytes) -> int:
+    builder, tasks = PageBufferBuilder(), []
+    extract_docx(file_content, builder, tasks)
+    return len(tasks)
+
+
+def measure(fn, file_content: bytes, repeat: int):
+    timings, queued = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        queued = fn(file_content)
+        timings.append(time.perf_counter() - started)
+    return min(timings), queued
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOCX extraction on a generated image-heavy file.")
+    parser.add_argument("--graphics", type=int, default=400)
+    parser.add_argument("--distinct-images", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    file_content = generate_docx(args.graphics, args.distinct_images)
+    print(f"{args.graphics} graphics, {args.distinct_images} distinct images, {len(file_content) / 2**20:.1f} MB")
+
+    print(f"{'extractor':>12} | {'seconds':>8} | {'OCR images':>10} | {'Azure calls':>11}")
+    results = {}
+    for name, fn in (("legacy", legacy_extract), ("single-pass", single_pass_extract)):
+        seconds, queued = measure(fn, file_content, args.repeat)
+        results[name] = seconds
+        print(f"{name:>12} | {seconds:>8.3f} | {queued:>10} | {queued * 2:>11}")
+    print(f"extraction x{results['legacy'] / results['single-pass']:.1f} faster")
+
+
+if __name__ == "__main__":
+    main()
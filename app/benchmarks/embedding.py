@@ -0,0 +1,138 @@
+"""
+Embedding throughput and query latency: the local embedding provider against
+the OpenAI embeddings endpoint that Weaviate's text2vec-openai module calls.
+
+Chunks are produced exactly as ingestion does, from a text file or from
+generated pages of varying length. Every provider reports chunks/sec for
+document embedding and the p50/p99 latency of embedding one query. The local
+model runs twice: with its token-budgeted dynamic batches and with a plain
+fixed batch size.
+
+The remote figures are a lower bound for the remote vectorizer path, since
+Weaviate adds its own hop in front of OpenAI.
+
+Run from the `app/` directory (needs sentence-transformers; the remote run
+needs OPENAI_API_KEY and is skipped without it):
+
+    python -m benchmarks.embedding --document sample.txt --queries 50
+"""
+import argparse
+import random
+import string
+import time
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+from openai import OpenAI
+
+from config import OPENAI_API_KEY, EMBEDDING_MODEL
+from services.chunking import PageBufferBuilder, split_into_chunks
+from services.embedding import LocalEmbeddingProvider
+
+FILE_TYPE = "text/plain"
+DOC_ID = "benchmark"
+REMOTE_BATCH_SIZE = 100
+
+
+def synthetic_pages(pages: int, seed: int = 0) -> List[str]:
+    """
+    Generate pages between 200 and 4000 characters long.
+    """
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(5000)]
+    result = []
+    for _ in range(pages):
+        target = rng.randint(200, 4000)
+        text = ""
+        while len(text) < target:
+            text += " ".join(rng.choices(words, k=rng.randint(5, 20))) + ". "
+        result.append(text)
+    return result
+
+
+def load_chunks(path: Optional[str], pages: int) -> List[str]:
+    builder = PageBufferBuilder()
+    if path:
+        with open(path) as f:
+            builder.add(1, f.read())
+    else:
+        for page_no, text in enumerate(synthetic_pages(pages), start=1):
+            builder.add(page_no, text)
+    table = split_into_chunks(builder.build(), FILE_TYPE, DOC_ID)
+    return [table.text(i) for i in range(len(table))]
+
+
+def sample_queries(chunks: List[str], count: int, seed: int = 0) -> List[str]:
+    """
+    Short questions made from the first words of random chunks.
+    """
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(chunks).split()[:12]) + "?" for _ in range(count)]
+
+
+def throughput(embed: Callable[[Sequence[str]], object], chunks: List[str]) -> float:
+    started = time.perf_counter()
+    embed(chunks)
+    return len(chunks) / (time.perf_counter() - started)
+
+
+def query_latency(embed_query: Callable[[str], object], queries: List[str]):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        embed_query(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def remote_embedder(model: str):
+    client = OpenAI(api_key=OPENAI_API_KEY)
+
+    def embed(texts: Sequence[str]):
+        vectors = []
+        for start in range(0, len(texts), REMOTE_BATCH_SIZE):
+            response = client.embeddings.create(model=model, input=list(texts[start:start + REMOTE_BATCH_SIZE]))
+            vectors.extend(item.embedding for item in response.data)
+        return vectors
+
+    return embed, lambda query: embed([query])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local vs remote embedding.")
+    parser.add_argument("--document", help="Text file to chunk; generated pages are used otherwise")
+    parser.add_argument("--pages", type=int, default=500, help="Generated pages when no document is given")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--fixed-batch-size", type=int, default=32)
+    parser.add_argument("--remote-model", default="text-embedding-3-small")
+    parser.add_argument("--skip-remote", action="store_true")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.document, args.pages)
+    queries = sample_queries(chunks, args.queries)
+    print(f"{len(chunks)} chunks, {len(queries)} queries")
+
+    provider = LocalEmbeddingProvider()
+    provider.embed_documents(chunks[:8])  # Warm up
+
+    def fixed_batches(texts: Sequence[str]):
+        return provider.model.encode(
+            list(texts), batch_size=args.fixed_batch_size, normalize_embeddings=True, show_progress_bar=False,
+        )
+
+    runs = {
+        f"local {EMBEDDING_MODEL.rsplit('/', 1)[-1]} (dynamic)": (provider.embed_documents, provider.embed_query),
+        f"local {EMBEDDING_MODEL.rsplit('/', 1)[-1]} (batch={args.fixed_batch_size})": (fixed_batches, provider.embed_query),
+    }
+    if not args.skip_remote and OPENAI_API_KEY:
+        runs[f"remote {args.remote_model}"] = remote_embedder(args.remote_model)
+
+    print(f"{'provider':>42} | {'chunks/s':>9} | {'query p50 ms':>12} | {'query p99 ms':>12}")
+    for name, (embed, embed_query) in runs.items():
+        rate = throughput(embed, chunks)
+        p50, p99 = query_latency(embed_query, queries)
+        print(f"{name:>42} | {rate:>9.1f} | {p50:>12.1f} | {p99:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
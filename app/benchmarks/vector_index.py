@@ -0,0 +1,311 @@
+"""
+Recall-vs-latency harness for vector index configurations.
+
+Copies the vectors of the `Document` collection into one scratch collection per
+index configuration, replays a query set against each of them and reports
+recall@k against exact (brute-force) search, p50/p99 query latency and memory.
+
+Run from the `app/` directory:
+
+    python -m benchmarks.vector_index --queries queries.json --k 10
+
+`queries.json` is a list of query strings, or of objects with a `text` key and
+optionally a precomputed `vector`. `--configs` takes a JSON object mapping a
+configuration name to settings shaped like `config.VECTOR_INDEX`; without it the
+built-in presets below are compared.
+"""
+import argparse
+import json
+import re
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+import numpy as np
+import weaviate.classes as wvc
+from openai import OpenAI
+
+from config import OPENAI_API_KEY, WEAVIATE_CLASS_NAME, WEAVIATE_VECTOR_NAME as VECTOR_NAME
+from services.vector_index import build_vector_index_config
+from services.weaviate import WeaviateService
+
+DEFAULT_CONFIGS = {
+    "hnsw-default": {"type": "hnsw"},
+    "hnsw-tuned": {"type": "hnsw", "hnsw": {"ef": 128, "ef_construction": 256, "max_connections": 32}},
+    "hnsw-pq": {"type": "hnsw", "quantizer": "pq", "pq": {"centroids": 256}},
+    "hnsw-bq": {"type": "hnsw", "quantizer": "bq", "hnsw": {"ef": 256}},
+    "hnsw-sq": {"type": "hnsw", "quantizer": "sq"},
+    "flat-bq": {"type": "flat", "quantizer": "bq", "bq": {"rescore_limit": 200}},
+    "dynamic-bq": {"type": "dynamic", "quantizer": "bq", "dynamic": {"threshold": 10000}},
+}
+# Distances exact_top_k can compute the ground truth for
+EXACT_DISTANCES = ("cosine", "dot", "l2-squared")
+
+
+def load_corpus(collection, max_objects: Optional[int] = None):
+    """
+    Stream vectors out of the source collection with the cursor iterator.
+
+    Returns:
+    - tuple: (uuids, vectors) where vectors is a float32 matrix.
+    """
+    uuids, vectors = [], []
+    for obj in collection.iterator(include_vector=True, return_properties=[]):
+        vector = obj.vector.get(VECTOR_NAME) if isinstance(obj.vector, dict) else obj.vector
+        if not vector:
+            continue
+        uuids.append(str(obj.uuid))
+        vectors.append(vector)
+        if max_objects and len(uuids) >= max_objects:
+            break
+    return uuids, np.asarray(vectors, dtype=np.float32)
+
+
+def resolve_embedding_model(collection) -> str:
+    """
+    Find the OpenAI model the collection vectorizes with, so query vectors match.
+    """
+    vectorizer = collection.config.get().vector_config[VECTOR_NAME].vectorizer
+    model = vectorizer.model or {}
+    name = model.get("model", "text-embedding-3-small")
+    if name == "ada":
+        return f"text-embedding-ada-{model.get('modelVersion', '002')}"
+    return name
+
+
+def load_queries(path: str, model: Optional[str], embedder=None) -> np.ndarray:
+    """
+    Load the query set and embed any query that does not carry its own vector,
+    with the local embedding provider if there is one, else with OpenAI.
+    """
+    with open(path) as f:
+        raw = json.load(f)
+    queries = [{"text": q} if isinstance(q, str) else q for q in raw]
+
+    missing = [q["text"] for q in queries if not q.get("vector")]
+    if missing:
+        if embedder is not None:
+            embedded = iter(embedder.embed_queries(missing).tolist())
+        else:
+            client = OpenAI(api_key=OPENAI_API_KEY)
+            response = client.embeddings.create(model=model, input=missing)
+            embedded = iter(item.embedding for item in response.data)
+        for q in queries:
+            if not q.get("vector"):
+                q["vector"] = next(embedded)
+
+    return np.asarray([q["vector"] for q in queries], dtype=np.float32)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, distance: str = "cosine") -> np.ndarray:
+    """
+    Brute-force nearest neighbours, used as ground truth for recall.
+    """
+    if distance not in EXACT_DISTANCES:
+        raise ValueError(f"No exact search for distance '{distance}', expected one of {EXACT_DISTANCES}")
+    if distance == "l2-squared":
+        scores = -(
+            (queries ** 2).sum(axis=1)[:, None]
+            - 2 * queries @ corpus.T
+            + (corpus ** 2).sum(axis=1)[None, :]
+        )
+    else:
+        if distance == "cosine":
+            corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+            queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        scores = queries @ corpus.T
+
+    top = np.argpartition(-scores, kth=min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def estimate_memory(settings: Dict, count: int, dims: int) -> int:
+    """
+    Rough in-memory footprint of a vector index, in bytes.
+
+    Vectors held in memory: float32 for uncompressed HNSW, one byte per segment
+    for PQ, one bit per dimension for BQ and one byte per dimension for SQ.
+    Flat indexes keep vectors on disk and only cache the BQ codes. HNSW adds its
+    graph: roughly 2 * maxConnections uint64 links per node on the base layer.
+    """
+    index_type = (settings.get("type") or "hnsw").lower()
+    quantizer = (settings.get("quantizer") or "none").lower()
+    max_connections = (settings.get("hnsw") or {}).get("max_connections") or 32
+    threshold = (settings.get("dynamic") or {}).get("threshold") or 10000
+
+    if quantizer == "pq":
+        segments = (settings.get("pq") or {}).get("segments") or dims // 4
+        vector_bytes = segments
+    elif quantizer == "bq":
+        vector_bytes = (dims + 7) // 8
+    elif quantizer == "sq":
+        vector_bytes = dims
+    else:
+        vector_bytes = dims * 4
+
+    graph_bytes = max_connections * 2 * 8
+    if index_type == "flat" or (index_type == "dynamic" and count < threshold):
+        return count * vector_bytes if quantizer == "bq" else 0
+    return count * (vector_bytes + graph_bytes)
+
+
+def scrape_heap_bytes(metrics_url: Optional[str]) -> Optional[int]:
+    """
+    Read the Go heap size from Weaviate's Prometheus endpoint, when enabled.
+    """
+    if not metrics_url:
+        return None
+    with urllib.request.urlopen(metrics_url, timeout=10) as response:
+        text = response.read().decode()
+    match = re.search(r"^go_memstats_heap_inuse_bytes\s+(\S+)$", text, re.MULTILINE)
+    return int(float(match.group(1))) if match else None
+
+
+def wait_for_indexing(client, name: str, timeout: float = 600.0):
+    """
+    Block until every shard of the collection has drained its indexing queue.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        shards = [
+            shard
+            for node in client.cluster.nodes(collection=name, output="verbose")
+            for shard in node.shards
+        ]
+        if shards and all(s.vector_queue_length == 0 and s.vector_indexing_status == "READY" for s in shards):
+            return
+        time.sleep(1)
+    raise TimeoutError(f"Vector indexing of {name} did not finish within {timeout}s")
+
+
+def run_config(client, name: str, settings: Dict, uuids: List[str], corpus: np.ndarray,
+               queries: np.ndarray, truth: np.ndarray, k: int, repeat: int,
+               metrics_url: Optional[str], keep: bool) -> Dict:
+    """
+    Build one scratch collection with the given index settings and measure it.
+    """
+    collection_name = f"{WEAVIATE_CLASS_NAME}Bench{re.sub(r'[^0-9A-Za-z]', '', name.title())}"
+    if client.collections.exists(collection_name):
+        client.collections.delete(collection_name)
+
+    settings = json.loads(json.dumps(settings))
+    if (settings.get("quantizer") or "").lower() == "pq":
+        # PQ only trains once trainingLimit objects exist; make sure it kicks in.
+        settings.setdefault("pq", {}).setdefault("training_limit", min(len(uuids), 100000))
+
+    heap_before = scrape_heap_bytes(metrics_url)
+    collection = client.collections.create(
+        name=collection_name,
+        vectorizer_config=[
+            wvc.config.Configure.NamedVectors.none(
+                name=VECTOR_NAME,
+                vector_index_config=build_vector_index_config(settings),
+            )
+        ],
+    )
+    try:
+        started = time.perf_counter()
+        with collection.batch.fixed_size(batch_size=500, concurrent_requests=4) as batch:
+            for uuid, vector in zip(uuids, corpus):
+                batch.add_object(properties={}, uuid=uuid, vector={VECTOR_NAME: vector.tolist()})
+        if collection.batch.failed_objects:
+            raise RuntimeError(f"{len(collection.batch.failed_objects)} objects failed to import")
+        wait_for_indexing(client, collection_name)
+        build_seconds = time.perf_counter() - started
+        heap_after = scrape_heap_bytes(metrics_url)
+
+        index_of = {uuid: i for i, uuid in enumerate(uuids)}
+        latencies, hits = [], 0
+        for _ in range(repeat):
+            for query, expected in zip(queries, truth):
+                t0 = time.perf_counter()
+                result = collection.query.near_vector(
+                    near_vector=query.tolist(),
+                    target_vector=VECTOR_NAME,
+                    limit=k,
+                    return_properties=[],
+                )
+                latencies.append((time.perf_counter() - t0) * 1000)
+                found = {index_of.get(str(obj.uuid)) for obj in result.objects}
+                hits += len(found.intersection(expected.tolist()))
+
+        return {
+            "config": name,
+            # A corpus smaller than k can only ever return len(uuids) neighbours
+            f"recall@{k}": hits / (len(queries) * repeat * min(k, len(uuids))),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "build_s": build_seconds,
+            "est_memory_mb": estimate_memory(settings, len(uuids), corpus.shape[1]) / 2**20,
+            "heap_delta_mb": (heap_after - heap_before) / 2**20 if heap_before is not None and heap_after is not None else None,
+        }
+    finally:
+        if not keep:
+            client.collections.delete(collection_name)
+
+
+def print_table(rows: List[Dict]):
+    columns = list(rows[0].keys())
+    print(" | ".join(f"{c:>14}" for c in columns))
+    for row in rows:
+        print(" | ".join(
+            f"{row[c]:>14.3f}" if isinstance(row[c], float) else f"{str(row[c]):>14}" for c in columns
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector index configurations on recall, latency and memory.")
+    parser.add_argument("--queries", required=True, help="JSON file with the query set to replay")
+    parser.add_argument("--configs", help="JSON file mapping configuration name to VECTOR_INDEX-style settings")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query for recall@k")
+    parser.add_argument("--repeat", type=int, default=3, help="Times to replay the query set per configuration")
+    parser.add_argument("--max-objects", type=int, help="Only copy this many objects from the source collection")
+    parser.add_argument("--distance", default="cosine", help="Distance of configurations that do not set their own")
+    parser.add_argument("--metrics-url", help="Weaviate Prometheus endpoint, e.g. http://localhost:2112/metrics")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch collections afterwards")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.configs:
+        with open(args.configs) as f:
+            configs = json.load(f)
+    else:
+        configs = DEFAULT_CONFIGS
+
+    service = WeaviateService()
+    service.connect()
+    try:
+        uuids, corpus = load_corpus(service.docs, args.max_objects)
+        if not uuids:
+            raise SystemExit(f"No vectors found in collection {WEAVIATE_CLASS_NAME}")
+        model = resolve_embedding_model(service.docs) if service.embedder is None else None
+        queries = load_queries(args.queries, model, service.embedder)
+        print(f"Corpus: {len(uuids)} vectors x {corpus.shape[1]} dims, {len(queries)} queries")
+
+        # A configuration may set its own distance; recall is measured against
+        # the exact neighbours under that same distance
+        configs = {name: {"distance": args.distance, **settings} for name, settings in configs.items()}
+        truths = {
+            distance: exact_top_k(corpus, queries, args.k, distance)
+            for distance in {settings["distance"] for settings in configs.values()}
+        }
+        rows = []
+        for name, settings in configs.items():
+            rows.append(run_config(
+                service.client, name, settings, uuids, corpus, queries, truths[settings["distance"]],
+                args.k, args.repeat, args.metrics_url, args.keep,
+            ))
+            print_table(rows[-1:])
+
+        print()
+        print_table(rows)
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(rows, f, indent=2)
+    finally:
+        service.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,18 @@ WEAVIATE_URL = os.getenv("WEAVIATE_URL", "http://localhost:8080")
 WEAVIATE_API_KEY = os.getenv("WEAVIATE_API_KEY")
 AZURE_VISION_KEY = os.getenv('AZURE_VISION_KEY')
 AZURE_VISION_ENDPOINT=os.getenv('AZURE_VISION_ENDPOINT')
+# Key required in the X-Admin-Key header of /admin endpoints; unset disables them
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+def _env_int(name: str):
+    """Read an optional integer setting; unset means "use Weaviate's default"."""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else None
+
+def _env_bool(name: str):
+    """Read an optional boolean setting; unset means "use Weaviate's default"."""
+    value = os.getenv(name)
+    return value.lower() in ("1", "true", "yes") if value not in (None, "") else None
 
 # Document Processing Configuration
 CHUNK_SIZE = 1000
@@ -17,6 +29,16 @@ CHUNK_OVERLAP = 200
 
 # Weaviate Configuration
 WEAVIATE_CLASS_NAME = "Document"
+WEAVIATE_VECTOR_NAME = "chunkData"
+WEAVIATE_VERSION_CLASS_NAME = "DocumentVersion"
+# Grace period before chunks of a superseded document version are deleted
+VERSION_GC_DELAY_SECONDS = float(os.getenv("VERSION_GC_DELAY_SECONDS", "30"))
+WEAVIATE_BATCH_SIZE = int(os.getenv("WEAVIATE_BATCH_SIZE", "100"))
+WEAVIATE_BATCH_CONCURRENCY = int(os.getenv("WEAVIATE_BATCH_CONCURRENCY", "2"))
+# Concurrent single-object updates when renumbering, retiring or adopting chunks
+WEAVIATE_UPDATE_CONCURRENCY = int(os.getenv("WEAVIATE_UPDATE_CONCURRENCY", "8"))
+# Must match QUERY_MAXIMUM_RESULTS of the Weaviate server, the cap on offset paging
+WEAVIATE_QUERY_MAXIMUM_RESULTS = int(os.getenv("WEAVIATE_QUERY_MAXIMUM_RESULTS", "10000"))
 WEAVIATE_SCHEMA = {
     "class": WEAVIATE_CLASS_NAME,
     "vectorizer": "text2vec-openai",
@@ -51,6 +73,86 @@ WEAVIATE_SCHEMA = {
     ]
 }
 
+# Vector Index Configuration
+# Applied when the collection is created. Any value left unset falls back to
+# Weaviate's own default, so an empty environment reproduces a plain HNSW index.
+#   VECTOR_INDEX_TYPE      : hnsw | flat | dynamic
+#   VECTOR_INDEX_QUANTIZER : none | pq | bq | sq  (flat only supports bq)
+VECTOR_INDEX = {
+    "type": os.getenv("VECTOR_INDEX_TYPE", "hnsw"),
+    "distance": os.getenv("VECTOR_INDEX_DISTANCE"),
+    "quantizer": os.getenv("VECTOR_INDEX_QUANTIZER", "none"),
+    "hnsw": {
+        "ef": _env_int("HNSW_EF"),
+        "ef_construction": _env_int("HNSW_EF_CONSTRUCTION"),
+        "max_connections": _env_int("HNSW_MAX_CONNECTIONS"),
+        "dynamic_ef_min": _env_int("HNSW_DYNAMIC_EF_MIN"),
+        "dynamic_ef_max": _env_int("HNSW_DYNAMIC_EF_MAX"),
+        "dynamic_ef_factor": _env_int("HNSW_DYNAMIC_EF_FACTOR"),
+        "vector_cache_max_objects": _env_int("HNSW_VECTOR_CACHE_MAX_OBJECTS"),
+    },
+    "flat": {
+        "vector_cache_max_objects": _env_int("FLAT_VECTOR_CACHE_MAX_OBJECTS"),
+    },
+    "dynamic": {
+        # Object count at which a dynamic index switches from flat to HNSW.
+        # Requires ASYNC_INDEXING to be enabled on the Weaviate server.
+        "threshold": _env_int("DYNAMIC_INDEX_THRESHOLD"),
+    },
+    "pq": {
+        "segments": _env_int("PQ_SEGMENTS"),
+        "centroids": _env_int("PQ_CENTROIDS"),
+        "training_limit": _env_int("PQ_TRAINING_LIMIT"),
+    },
+    "bq": {
+        "cache": _env_bool("BQ_CACHE"),
+        "rescore_limit": _env_int("BQ_RESCORE_LIMIT"),
+    },
+    "sq": {
+        "cache": _env_bool("SQ_CACHE"),
+        "rescore_limit": _env_int("SQ_RESCORE_LIMIT"),
+        "training_limit": _env_int("SQ_TRAINING_LIMIT"),
+    },
+}
+
+# Embedding Configuration
+#   EMBEDDING_PROVIDER : weaviate | local
+# "weaviate" lets the text2vec-openai module vectorize inside Weaviate. "local"
+# embeds chunks and queries in this process with a sentence-transformers model
+# and sends the vectors along (the collection is then created without a
+# vectorizer). Switching providers requires re-creating the collection.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "weaviate")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# torch | onnx | openvino (the latter two need the matching sentence-transformers extra)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+# CPU threads used by the model; unset keeps the library default
+EMBEDDING_THREADS = _env_int("EMBEDDING_THREADS")
+# Batches are sized so that (longest text in batch x batch size) stays under
+# EMBEDDING_BATCH_TOKENS, with at most EMBEDDING_MAX_BATCH_SIZE texts each
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "16384"))
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "128"))
+
+# Batch Query Configuration
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "500"))
+# Queries enhanced per LLM call, and concurrent LLM calls / searches per batch
+QUERY_BATCH_ENHANCE_GROUP_SIZE = int(os.getenv("QUERY_BATCH_ENHANCE_GROUP_SIZE", "20"))
+QUERY_BATCH_ENHANCE_CONCURRENCY = int(os.getenv("QUERY_BATCH_ENHANCE_CONCURRENCY", "4"))
+QUERY_BATCH_SEARCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_SEARCH_CONCURRENCY", "16"))
+
+# Profiling Configuration
+# Requests slower than PROFILE_SLOW_REQUEST_MS are captured automatically (0 disables)
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "5000"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+
+# Snapshot Configuration
+# Snapshots are written under SNAPSHOT_DIR, in shards of SNAPSHOT_SHARD_SIZE objects
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_SHARD_SIZE = int(os.getenv("SNAPSHOT_SHARD_SIZE", "50000"))
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "500"))
+SNAPSHOT_BATCH_CONCURRENCY = int(os.getenv("SNAPSHOT_BATCH_CONCURRENCY", "4"))
+
 # Supported document types
 SUPPORTED_DOCUMENT_TYPES = {
     "pdf": "application/pdf",
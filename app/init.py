@@ -1,14 +1,20 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from services.weaviate import WeaviateService
 from services.llm_service import QueryEnhancer
+from services.profiler import Profiler
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Connect to Weaviate
     WeaviateService().connect()
+    # Documents stored before versioning are adopted without delaying startup
+    WeaviateService().start_migration()
     QueryEnhancer()
+    # Attribute tasks and to_thread work to the request being profiled
+    Profiler().install(asyncio.get_running_loop())
     # ml_models["answer_to_everything"] = fake_answer_to_everything_ml_model
     yield
     # disconnect at end of server
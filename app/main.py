@@ -1,14 +1,31 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Optional
+from fastapi.responses import Response
+from typing import Optional, Dict, List
+import asyncio
 import uvicorn
 
 from init import lifespan
 from services.document import process_document
 from services.weaviate import WeaviateService
 from services.llm_service import QueryEnhancer
+from services.snapshot import export_snapshot, import_snapshot, snapshot_path
+from services.batch_query import run_batch_query
+from services.profiler import Profiler, ProfilingMiddleware, stage, to_collapsed, to_speedscope
+from utils.auth import require_admin
 from utils.hash_generator import generate_document_id
-from models.api import QueryRequest, QueryResponse, ResponseModel, DocumentMetadata
+from models.api import (
+    QueryRequest,
+    QueryResponse,
+    BatchQueryRequest,
+    BatchQueryResponse,
+    ResponseModel,
+    DocumentMetadata,
+    ProfilingArmRequest,
+    SnapshotExportRequest,
+    SnapshotImportRequest,
+)
+from config import QUERY_BATCH_MAX_SIZE
 
 ragApp = FastAPI(
     title="RinggAI Backend Task",
@@ -25,6 +42,9 @@ ragApp.add_middleware(
     allow_headers=["*"],
 )
 
+# Trace every request so slow or armed ones land in the profiling ring buffer
+ragApp.add_middleware(ProfilingMiddleware)
+
 @ragApp.post("/documents/upload",response_model=ResponseModel[DocumentMetadata])
 async def upload_document(
     file: UploadFile = File(...),
@@ -38,7 +58,8 @@ async def upload_document(
         # read file and create chunking
         chunks,metadata = await process_document(file=file,docId=docId)
         # save to waveate 
-        await WeaviateService().store_document(doc_id=docId,chunks=chunks,metadata=metadata)
+        with stage("store"):
+            await WeaviateService().store_document(doc_id=docId,chunks=chunks,metadata=metadata)
         
         return ResponseModel(
                 status=200,
@@ -61,8 +82,10 @@ async def query_document(query: QueryRequest):
     Query against specific documents to retrieve relevant information.
     """
     try:
-        enhancce_query = QueryEnhancer().enhance_query(query.text)
-        result = await WeaviateService().query(query_text= query.text,document_id= query.document_id,enhance_query=enhancce_query)
+        with stage("enhance"):
+            enhancce_query = QueryEnhancer().enhance_query(query.text)
+        with stage("search"):
+            result = await WeaviateService().query(query_text= query.text,document_id= query.document_id,enhance_query=enhancce_query)
         return ResponseModel(
             data=result,
             status=200,
@@ -76,6 +99,126 @@ async def query_document(query: QueryRequest):
             )
         # raise   HTTPException(status_code=400, detail=str(e))
 
+@ragApp.post("/query/batch", response_model=ResponseModel[BatchQueryResponse])
+async def query_documents_batch(batch: BatchQueryRequest):
+    """
+    Run many queries in one request. Identical queries are executed once,
+    enhancement is batched and searches run concurrently; results are returned
+    in request order with a status and error per query.
+    """
+    if not batch.queries or len(batch.queries) > QUERY_BATCH_MAX_SIZE:
+        return ResponseModel(
+                status=400,
+                error=f"A batch must contain between 1 and {QUERY_BATCH_MAX_SIZE} queries",
+                message="Error While Executing Batch Query"
+            )
+    try:
+        result = await run_batch_query(batch)
+        return ResponseModel(
+            data=result,
+            status=200,
+            message="Batch query executed successfully",
+        )
+    except Exception as e:
+        return ResponseModel(
+                status=400,
+                error=str(e),
+                message="Error While Executing Batch Query"
+            )
+
+@ragApp.post("/admin/snapshots/export", response_model=ResponseModel[Dict], dependencies=[Depends(require_admin)])
+async def export_collection_snapshot(request: SnapshotExportRequest):
+    """
+    Stream the collection (or the given documents) with their vectors to a snapshot under SNAPSHOT_DIR.
+    """
+    try:
+        snapshot = await asyncio.to_thread(
+            export_snapshot, snapshot_path(request.name), request.document_ids
+        )
+        snapshot = {key: value for key, value in snapshot.items() if key not in ("shards", "documents")}
+        return ResponseModel(
+            data=snapshot,
+            status=200,
+            message="Snapshot exported successfully",
+        )
+    except Exception as e:
+        return ResponseModel(
+                status=400,
+                error=str(e),
+                message="Error While Exporting Snapshot"
+            )
+
+@ragApp.post("/admin/snapshots/import", response_model=ResponseModel[Dict], dependencies=[Depends(require_admin)])
+async def import_collection_snapshot(request: SnapshotImportRequest):
+    """
+    Bulk-load a snapshot from SNAPSHOT_DIR with its stored vectors, without re-embedding.
+    """
+    try:
+        result = await asyncio.to_thread(import_snapshot, snapshot_path(request.name))
+        return ResponseModel(
+            data=result,
+            status=200,
+            message="Snapshot imported successfully",
+        )
+    except Exception as e:
+        return ResponseModel(
+                status=400,
+                error=str(e),
+                message="Error While Importing Snapshot"
+            )
+
+@ragApp.post("/admin/profiling/arm", response_model=ResponseModel[Dict], dependencies=[Depends(require_admin)])
+async def arm_profiling(request: ProfilingArmRequest):
+    """
+    Sample the stacks of the next N requests and/or of every request in a time window.
+    """
+    return ResponseModel(
+        data=Profiler().arm(requests=request.requests, seconds=request.seconds),
+        status=200,
+        message="Profiling armed",
+    )
+
+@ragApp.get("/admin/profiling/profiles", response_model=ResponseModel[List[Dict]], dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """
+    List the captured (armed or slow) requests with their per-stage timings.
+    """
+    return ResponseModel(
+        data=[trace.summary() for trace in Profiler().profiles],
+        status=200,
+        message="Captured profiles",
+    )
+
+@ragApp.get("/admin/profiling/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: int, format: str = Query("speedscope", pattern="^(speedscope|collapsed)$")):
+    """
+    Download a captured profile as a speedscope file or as collapsed stacks for flamegraph tools.
+    """
+    trace = Profiler().get(profile_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        content, media_type, extension = to_collapsed(trace), "text/plain", "folded"
+    else:
+        content, media_type, extension = to_speedscope(trace), "application/json", "speedscope.json"
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.{extension}"'},
+    )
+
+@ragApp.delete("/admin/profiling/profiles", response_model=ResponseModel[Dict], dependencies=[Depends(require_admin)])
+async def clear_profiles():
+    """
+    Empty the profiling ring buffer.
+    """
+    Profiler().clear()
+    return ResponseModel(
+        data=Profiler().status(),
+        status=200,
+        message="Profiles cleared",
+    )
+
 @ragApp.get("/health")
 async def health_check():
     # await WeaviateService().delete_collection()
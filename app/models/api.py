@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional, List, Dict, TypeVar, Generic
 from pydantic.generics import GenericModel
 
@@ -14,6 +14,11 @@ class QueryRequest(BaseModel):
     text: str = Field(..., description="The query text to search for")
     document_id: Optional[str] = Field(None, description="Optional document ID to restrict the search to")
 
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest] = Field(..., description="The queries to run; identical queries are only executed once")
+    enhance: bool = Field(True, description="Expand the queries with the LLM before searching")
+    generate: bool = Field(True, description="Generate an answer per query; when false only snippets are returned")
+
 class TextSnippet(BaseModel):
     content: str = Field(..., description="The retrieved text content")
     document_id: str = Field(..., description="The ID of the source document")
@@ -26,10 +31,38 @@ class QueryResponse(BaseModel):
     total_results: int = Field(..., description="Total number of results found")
     result:str = Field(...,description="Reply for Query")
 
+class BatchQueryItem(BaseModel):
+    index: int = Field(..., description="Position of the query in the request")
+    status: int = Field(..., description="200 on success, 400 if this query failed")
+    error: Optional[str] = Field(None, description="Why this query failed")
+    data: Optional[QueryResponse] = Field(None, description="The query result")
+
+class BatchQueryResponse(BaseModel):
+    results: List[BatchQueryItem] = Field(..., description="One result per query, in request order")
+    total_queries: int = Field(..., description="Number of queries in the request")
+    unique_queries: int = Field(..., description="Number of distinct queries actually executed")
+
 class DocumentMetadata(BaseModel):
     document_id: str = Field(..., description="Unique ID for the document")
     file_name: str = Field(..., description="Original file name")
     file_type: str = Field(..., description="File type/extension")
     upload_timestamp: str = Field(..., description="Timestamp of upload")
     total_chunks: int = Field(..., description="Number of chunks the document was split into")
-    additional_info: Dict = Field(default_factory=dict, description="Additional document metadata") 
\ No newline at end of file
+    additional_info: Dict = Field(default_factory=dict, description="Additional document metadata") 
+
+class ProfilingArmRequest(BaseModel):
+    requests: Optional[int] = Field(None, ge=1, description="Profile the next N requests")
+    seconds: Optional[float] = Field(None, gt=0, description="Profile every request for this many seconds")
+
+    @model_validator(mode="after")
+    def check_armed(self):
+        if self.requests is None and self.seconds is None:
+            raise ValueError("Set requests and/or seconds")
+        return self
+
+class SnapshotExportRequest(BaseModel):
+    name: str = Field(..., pattern=r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$", description="Name of the snapshot directory under SNAPSHOT_DIR; may not start with a dot")
+    document_ids: Optional[List[str]] = Field(None, description="Only export these documents; all documents when omitted")
+
+class SnapshotImportRequest(BaseModel):
+    name: str = Field(..., pattern=r"^[A-Za-z0-9_-][A-Za-z0-9_.-]*$", description="Name of the snapshot directory under SNAPSHOT_DIR; may not start with a dot")
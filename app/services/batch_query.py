@@ -0,0 +1,150 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple, Union
+
+from config import (
+    QUERY_BATCH_ENHANCE_GROUP_SIZE,
+    QUERY_BATCH_ENHANCE_CONCURRENCY,
+    QUERY_BATCH_SEARCH_CONCURRENCY,
+)
+from models.api import BatchQueryRequest, BatchQueryResponse, BatchQueryItem, QueryResponse
+from services.llm_service import QueryEnhancer
+from services.profiler import stage
+from services.weaviate import WeaviateService
+
+
+async def _enhance_group(texts: List[str], semaphore: asyncio.Semaphore) -> Optional[List[str]]:
+    """
+    Enhance a group of queries with one LLM call, or return None if that fails.
+    """
+    async with semaphore:
+        try:
+            return await asyncio.to_thread(QueryEnhancer().enhance_queries, texts)
+        except Exception:
+            return None
+
+
+async def _enhance_one(text: str, semaphore: asyncio.Semaphore) -> Union[str, Exception]:
+    """
+    Enhance a single query, the fallback when a batched call fails.
+    """
+    async with semaphore:
+        try:
+            return await asyncio.to_thread(QueryEnhancer().enhance_query, text)
+        except Exception as e:
+            return e
+
+
+async def enhance_all(texts: List[str]) -> Dict[str, Union[str, Exception]]:
+    """
+    Enhance distinct query texts in groups of QUERY_BATCH_ENHANCE_GROUP_SIZE per
+    LLM call, with at most QUERY_BATCH_ENHANCE_CONCURRENCY calls in flight.
+    Groups whose batched answer cannot be used fall back to one call per query.
+
+    Args:
+    - texts (List[str]): The distinct query texts.
+
+    Returns:
+    - Dict[str, Union[str, Exception]]: The enhanced query, or the error, per text.
+    """
+    semaphore = asyncio.Semaphore(QUERY_BATCH_ENHANCE_CONCURRENCY)
+    groups = [
+        texts[start:start + QUERY_BATCH_ENHANCE_GROUP_SIZE]
+        for start in range(0, len(texts), QUERY_BATCH_ENHANCE_GROUP_SIZE)
+    ]
+    group_results = await asyncio.gather(*(_enhance_group(group, semaphore) for group in groups))
+
+    enhanced: Dict[str, Union[str, Exception]] = {}
+    retry = []
+    for group, result in zip(groups, group_results):
+        if result is None:
+            retry.extend(group)
+        else:
+            enhanced.update(zip(group, result))
+
+    retried = await asyncio.gather(*(_enhance_one(text, semaphore) for text in retry))
+    enhanced.update(zip(retry, retried))
+    return enhanced
+
+
+async def run_batch_query(request: BatchQueryRequest) -> BatchQueryResponse:
+    """
+    Run many queries at once.
+
+    Identical (text, document_id) pairs are executed once. Enhancement is
+    batched into few LLM calls, query vectors (with a local embedding provider)
+    are computed in one batched pass, the version filter is resolved once per
+    document, and the hybrid searches run concurrently
+    on worker threads sharing the Weaviate client. Failures are reported per query.
+
+    Args:
+    - request (BatchQueryRequest): The queries and batch options.
+
+    Returns:
+    - BatchQueryResponse: One result per query, in request order.
+    """
+    keys: List[Tuple[str, Optional[str]]] = [(query.text, query.document_id) for query in request.queries]
+    unique_keys = list(dict.fromkeys(keys))
+
+    enhanced = {}
+    if request.enhance:
+        with stage("enhance"):
+            enhanced = await enhance_all(list(dict.fromkeys(text for text, _ in unique_keys)))
+
+    service = WeaviateService()
+    vectors: Dict[str, List[float]] = {}
+    if service.embedder is not None:
+        search_texts = list(dict.fromkeys(
+            enhanced.get(text) or text
+            for text, _ in unique_keys
+            if not isinstance(enhanced.get(text), Exception)
+        ))
+        with stage("embed"):
+            matrix = await asyncio.to_thread(service.embedder.embed_queries, search_texts)
+        vectors = dict(zip(search_texts, matrix.tolist()))
+
+    semaphore = asyncio.Semaphore(QUERY_BATCH_SEARCH_CONCURRENCY)
+
+    async def resolve_filter(document_id: Optional[str]):
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(service.query_filter, document_id)
+            except Exception as e:
+                return Exception(f"Failed to query Weaviate: {str(e)}")
+
+    document_ids = list(dict.fromkeys(document_id for _, document_id in unique_keys))
+    with stage("filters"):
+        filters = dict(zip(document_ids, await asyncio.gather(*(resolve_filter(d) for d in document_ids))))
+
+    async def search(key: Tuple[str, Optional[str]]) -> Union[QueryResponse, Exception]:
+        text, document_id = key
+        enhance_query = enhanced.get(text, '')
+        if isinstance(enhance_query, Exception):
+            return enhance_query
+        if isinstance(filters[document_id], Exception):
+            return filters[document_id]
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(
+                    service.search,
+                    query_text=text,
+                    document_id=document_id,
+                    enhance_query=enhance_query,
+                    generate=request.generate,
+                    vector=vectors.get(enhance_query or text),
+                    filters=filters[document_id],
+                )
+            except Exception as e:
+                return e
+
+    with stage("search"):
+        results = dict(zip(unique_keys, await asyncio.gather(*(search(key) for key in unique_keys))))
+
+    items = []
+    for index, key in enumerate(keys):
+        result = results[key]
+        if isinstance(result, Exception):
+            items.append(BatchQueryItem(index=index, status=400, error=str(result)))
+        else:
+            items.append(BatchQueryItem(index=index, status=200, data=result))
+
+    return BatchQueryResponse(results=items, total_queries=len(keys), unique_queries=len(unique_keys))
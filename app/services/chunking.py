@@ -0,0 +1,179 @@
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+from utils.hash_generator import generate_chunk_uuid
+
+
+class PageBufferBuilder:
+    """
+    Collects extracted page/block texts before they are laid out in a PageBuffer.
+    """
+    __slots__ = ("_page_no", "_is_image", "_texts")
+
+    def __init__(self):
+        self._page_no = array("q")
+        self._is_image = array("b")
+        self._texts: List[str] = []
+
+    def add(self, page_no, text: str, is_image: bool = False):
+        """
+        Record the text of one page, block or processed image.
+
+        Args:
+        - page_no: The page number (int or numeric string) the text belongs to.
+        - text (str): The extracted text. Empty texts are skipped.
+        - is_image (bool): Whether the text was extracted from an image.
+        """
+        if not text:
+            return
+        self._page_no.append(int(page_no))
+        self._is_image.append(1 if is_image else 0)
+        self._texts.append(text)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def build(self) -> "PageBuffer":
+        """
+        Order entries by page (text before images) and join them into one buffer.
+
+        Returns:
+        - PageBuffer: The entries laid out back to back in a single string.
+        """
+        order = sorted(range(len(self._texts)), key=lambda i: (self._page_no[i], self._is_image[i]))
+
+        page_no, is_image = array("q"), array("b")
+        starts, ends = array("Q"), array("Q")
+        offset = 0
+        for i in order:
+            page_no.append(self._page_no[i])
+            is_image.append(self._is_image[i])
+            starts.append(offset)
+            offset += len(self._texts[i])
+            ends.append(offset)
+
+        buffer = "".join([self._texts[i] for i in order])
+        self._texts = []
+        return PageBuffer(buffer, page_no, is_image, starts, ends)
+
+
+class PageBuffer:
+    """
+    All text of a document in one string, with each entry addressed by offsets.
+    """
+    __slots__ = ("buffer", "page_no", "is_image", "starts", "ends")
+
+    def __init__(self, buffer: str, page_no: array, is_image: array, starts: array, ends: array):
+        self.buffer = buffer
+        self.page_no = page_no
+        self.is_image = is_image
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> Tuple[int, bool, str]:
+        """
+        Return (page_no, is_image, text) for entry `i`, materializing its text.
+        """
+        return self.page_no[i], bool(self.is_image[i]), self.buffer[self.starts[i]:self.ends[i]]
+
+
+class ChunkTable:
+    """
+    Overlapping chunk windows over a PageBuffer, stored as offset arrays.
+
+    Chunk text is only sliced out of the page buffer when a chunk is serialized,
+    so the table itself costs a few bytes per chunk regardless of CHUNK_SIZE.
+    """
+    __slots__ = ("pages", "doc_id", "file_type", "entry", "starts", "ends")
+
+    def __init__(self, pages: PageBuffer, doc_id: str, file_type: str):
+        self.pages = pages
+        self.doc_id = doc_id
+        self.file_type = file_type
+        self.entry = array("Q")
+        self.starts = array("Q")
+        self.ends = array("Q")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def append(self, entry: int, start: int, end: int):
+        self.entry.append(entry)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def text(self, i: int) -> str:
+        """
+        Materialize the text of chunk `i`.
+        """
+        return self.pages.buffer[self.starts[i]:self.ends[i]]
+
+    def properties(self, i: int) -> Dict:
+        """
+        Serialize chunk `i` into the Weaviate object properties.
+        """
+        entry = self.entry[i]
+        return {
+            "docId": self.doc_id,
+            "pageNo": str(self.pages.page_no[entry]),
+            "chunkId": str(i),
+            "chunkDataType": "image" if self.pages.is_image[entry] else "text",
+            "chunkData": self.text(i),
+            "fileType": self.file_type,
+        }
+
+    def object_uuids(self) -> List[str]:
+        """
+        Deterministic Weaviate UUIDs for every chunk, derived from its content.
+
+        Identical chunks on the same page get distinct UUIDs by occurrence.
+        """
+        uuids, seen = [], set()
+        for i in range(len(self)):
+            entry = self.entry[i]
+            key = (
+                self.doc_id,
+                str(self.pages.page_no[entry]),
+                "image" if self.pages.is_image[entry] else "text",
+                self.text(i),
+            )
+            occurrence = 0
+            uuid = generate_chunk_uuid(*key, occurrence)
+            while uuid in seen:
+                occurrence += 1
+                uuid = generate_chunk_uuid(*key, occurrence)
+            seen.add(uuid)
+            uuids.append(uuid)
+        return uuids
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.properties(i)
+
+
+def split_into_chunks(pages: PageBuffer, file_type: str, doc_id: str) -> ChunkTable:
+    """
+    Split every page entry into CHUNK_SIZE windows overlapping by CHUNK_OVERLAP.
+
+    Args:
+    - pages (PageBuffer): The extracted document text.
+    - file_type (str): The type of the file.
+    - doc_id (str): The unique identifier for the document.
+
+    Returns:
+    - ChunkTable: Offsets of every chunk into the page buffer.
+    """
+    chunks = ChunkTable(pages, doc_id, file_type)
+    step = CHUNK_SIZE - CHUNK_OVERLAP
+
+    for entry in range(len(pages)):
+        start, page_end = pages.starts[entry], pages.ends[entry]
+        while start < page_end:
+            chunks.append(entry, start, min(start + CHUNK_SIZE, page_end))
+            start += step  # Move forward with overlap
+
+    return chunks
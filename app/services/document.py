@@ -1,17 +1,18 @@
 import json
 from datetime import datetime
 from typing import Optional, List, Dict
-import weaviate.classes as wvc
 import pymupdf
 from PIL import Image
 import io
 
-from docx import Document as DocxDocument
 from fastapi import UploadFile, HTTPException
 
-from config import CHUNK_SIZE, CHUNK_OVERLAP, SUPPORTED_DOCUMENT_TYPES
+from config import SUPPORTED_DOCUMENT_TYPES
 from models.api import DocumentMetadata
+from services.chunking import PageBuffer, PageBufferBuilder, ChunkTable, split_into_chunks
 from services.vision_service import process_all_images_async
+from services.docx_reader import extract_docx
+from services.profiler import stage
 
 def check_allowed_file(file_content_type: str) -> bool:
     """
@@ -34,14 +35,15 @@ async def process_document(docId:str ,file: UploadFile) -> tuple:
     - file (UploadFile): The uploaded file to be processed.
 
     Returns:
-    - tuple: A tuple containing the processed chunks and metadata of the document.
+    - tuple: A tuple containing the processed chunks (ChunkTable) and metadata of the document.
     """
     if file.content_type not in SUPPORTED_DOCUMENT_TYPES.values():
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
     # Read and process the document
     content = await read_document(file)
-    chunks = convert_to_chunk_and_schema(content,file.content_type,docId)
+    with stage("chunking"):
+        chunks = convert_to_chunk_and_schema(content,file.content_type,docId)
     
     # Create metadata
     metadata = DocumentMetadata(
@@ -55,7 +57,7 @@ async def process_document(docId:str ,file: UploadFile) -> tuple:
 
     return (chunks,metadata)
 
-async def read_document( file: UploadFile) -> list:
+async def read_document( file: UploadFile) -> PageBuffer:
     """
     Reads content from various document formats and extracts text and images.
 
@@ -63,36 +65,51 @@ async def read_document( file: UploadFile) -> list:
     - file (UploadFile): The uploaded file to be read and processed.
 
     Returns:
-    - list: A list of dictionaries containing extracted data, including page number, text, and images.
+    - PageBuffer: The extracted text of every page and image, ordered by page number.
+    """
+    with stage("read_upload"):
+        file_content = await file.read()
+
+    with stage("extract"):
+        extracted_data, image_processing_tasks = extract_content(file.content_type, file_content)
+
+    with stage("ocr"):
+        processed_images =await process_all_images_async(image_processing_tasks)
+    
+    for proc_img in processed_images:
+        extracted_data.add(proc_img["page_no"], proc_img["text"], is_image=True)
+        
+    # Sort by page (text before images) and lay everything out in one buffer
+    return extracted_data.build()
+
+def extract_content(content_type: str, file_content: bytes) -> tuple:
+    """
+    Extracts the text of a document and collects the images that need OCR.
+
+    Args:
+    - content_type (str): The MIME type of the file.
+    - file_content (bytes): The raw file content.
+
+    Returns:
+    - tuple: The PageBufferBuilder with the extracted text and the list of image processing tasks.
     """
     content = ""
-    file_content = await file.read()
-    extracted_data = []
+    extracted_data = PageBufferBuilder()
     image_processing_tasks=[]
     
-    if file.content_type == SUPPORTED_DOCUMENT_TYPES["pdf"]:
+    if content_type == SUPPORTED_DOCUMENT_TYPES["pdf"]:
         # Read PDF
         doc = pymupdf.Document(stream=file_content)  # Open PDF
         
         for  page_no,page in enumerate(doc, start=1):
-            print(page)
-            print(page_no)
             # Extract text blocks
             text_blocks = page.get_text("blocks")
             # Each block is (x0, y0, x1, y1, "text", block_no, block_type)
-            formatted_blocks = ''
-            for block in text_blocks:
-                if block[6] == 0:  # Text block (type 0)
-                    formatted_blocks =formatted_blocks +'\n' + block[4]  # Get the text
+            block_texts = [block[4] for block in text_blocks if block[6] == 0]  # Text block (type 0)
             
             # Add text entry if there are any text blocks
-            if formatted_blocks:
-                extracted_data.append({
-                    "page_no": str(page_no + 1),
-                    "is_image": False,
-                    "image": None,
-                    "text": formatted_blocks
-                })
+            if block_texts:
+                extracted_data.add(page_no + 1, '\n' + '\n'.join(block_texts))
             
             # Extract images
             image_list = page.get_images(full=True)
@@ -110,118 +127,45 @@ async def read_document( file: UploadFile) -> list:
                     image_processing_tasks.append((image, str(page_no + 1), img_index))
             # return extracted_data
             
-    elif file.content_type == SUPPORTED_DOCUMENT_TYPES["docx"]:
-        # Read DOCX
-        doc = DocxDocument(io.BytesIO(file_content))
-        # extracted_data = []
-
-        for i,element  in enumerate(doc.element.body):
-            # Extract Text
-            if element.tag.endswith('p'):  # Paragraphs
-                text = element.text.strip()
-                if text:
-                    extracted_data.append({"page_no": i, "is_image": False, "text": text, "image": None})
-
-            # Extract Images
-            elif element.tag.endswith('graphic'):  
-                for rel in doc.part.rels:
-                    if "image" in doc.part.rels[rel].target_ref:
-                        image_bytes = doc.part.rels[rel].target_part.blob
-                        image = Image.open(io.BytesIO(image_bytes))
-                        if image.size[0] > 250 and image.size[1] > 250:
-                        # Extract text from image using OCR
-                            image_processing_tasks.append((image, str(page_no + 1), img_index))
-
-        # return extracted_data
+    elif content_type == SUPPORTED_DOCUMENT_TYPES["docx"]:
+        # Read DOCX: text, tables and images per page in one pass
+        extract_docx(file_content, extracted_data, image_processing_tasks)
         
-    elif file.content_type == SUPPORTED_DOCUMENT_TYPES["json"]:
+    elif content_type == SUPPORTED_DOCUMENT_TYPES["json"]:
         
         # Read JSON
         try:
             json_content = json.loads(file_content)
             if isinstance(json_content,list):
                 for i,d in enumerate(json_content):
-                    extracted_data.append({
-                        "page_no":i, 
-                        "is_image": False, 
-                        "text": json.dumps(d), 
-                        "image": None,
-                        })
+                    extracted_data.add(i, json.dumps(d))
             else:
-                extracted_data.append({
-                    "page_no": 0, 
-                    "is_image": False, 
-                    "text": json.dumps(json_content), 
-                    "image": None
-                    })
+                extracted_data.add(0, json.dumps(json_content))
             
             # return extracted_data
         except json.JSONDecodeError:
             raise HTTPException(status_code=400, detail="Invalid JSON file")
             
-    elif file.content_type == SUPPORTED_DOCUMENT_TYPES["txt"]:
+    elif content_type == SUPPORTED_DOCUMENT_TYPES["txt"]:
         # Read TXT
         content = file_content.decode("utf-8")
-        extracted_data.append({
-            "page_no": 0,
-            "is_image": False,
-            "text": content,
-            "image": None
-        })
-    
-    processed_images = []
-    processed_images =await process_all_images_async(image_processing_tasks)
-    
-    for proc_img in processed_images:
-        extracted_data.append({
-            "page_no": proc_img["page_no"],
-            "is_image": True,
-            "image": None,
-            "text": proc_img["text"],
-        })
-        
-    extracted_data.sort(key=lambda x: (int(x["page_no"]), x["is_image"]))
-    
-    return extracted_data
+        extracted_data.add(0, content)
+
+    return extracted_data, image_processing_tasks
 
-def convert_to_chunk_and_schema(extracted_data: list,file_type:str,docId:str) -> List[Dict]:
+def convert_to_chunk_and_schema(extracted_data: PageBuffer,file_type:str,docId:str) -> ChunkTable:
     """
-    Splits text into overlapping chunks and returns as a list of dictionaries.
+    Splits text into overlapping chunks.
+
+    Chunks are kept as offsets into the page buffer; their text and Weaviate
+    properties are only materialized when the chunks are iterated for storage.
 
     Args:
-    - extracted_data (list): A list of dictionaries containing extracted data.
+    - extracted_data (PageBuffer): The extracted document text.
     - file_type (str): The type of the file.
     - docId (str): The unique identifier for the document.
 
     Returns:
-    - List[Dict]: A list of dictionaries representing the chunks of the document.
+    - ChunkTable: The chunks of the document.
     """
-    chunks = []
-    chunk_id = 0  
-    
-    for item in extracted_data:
-        text = item["text"]
-        is_image = item["is_image"]
-
-        if text:
-           
-            start = 0
-            while start < len(text):
-                end = min(start + CHUNK_SIZE, len(text))
-                chunk_text = text[start:end]
-                temp_chunk = {
-                    "docId":docId,
-                    "pageNo": str(item["page_no"]),
-                    "chunkId": str(chunk_id),
-                    "chunkDataType": "image" if is_image else "text",
-                    "chunkData": chunk_text,
-                    "fileType": file_type
-                }
-                
-                chunks.append(wvc.data.DataObject(properties=temp_chunk))
-
-                chunk_id += 1
-                start += CHUNK_SIZE - CHUNK_OVERLAP  # Move forward with overlap
-
-    return chunks
-
+    return split_into_chunks(extracted_data, file_type, docId)
@@ -0,0 +1,187 @@
+import io
+from typing import List, Optional
+
+from PIL import Image
+from docx import Document as DocxDocument
+from docx.oxml.ns import qn
+
+from services.chunking import PageBufferBuilder
+
+W_P = qn("w:p")
+W_TBL = qn("w:tbl")
+W_TR = qn("w:tr")
+W_TC = qn("w:tc")
+W_T = qn("w:t")
+W_TAB = qn("w:tab")
+W_BR = qn("w:br")
+W_CR = qn("w:cr")
+W_TYPE = qn("w:type")
+W_VAL = qn("w:val")
+W_PPR = qn("w:pPr")
+W_SECTPR = qn("w:sectPr")
+W_PAGE_BREAK_BEFORE = qn("w:pageBreakBefore")
+W_LAST_RENDERED_PAGE_BREAK = qn("w:lastRenderedPageBreak")
+A_BLIP = qn("a:blip")
+# Legacy VML pictures; python-docx has no prefix registered for this namespace
+V_IMAGEDATA = "{urn:schemas-microsoft-com:vml}imagedata"
+# Alternate content: Word writes text boxes into both mc:Choice and mc:Fallback
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+R_EMBED = qn("r:embed")
+R_ID = qn("r:id")
+
+MIN_IMAGE_SIZE = 250
+
+
+def _iter_content(node):
+    """
+    Like node.iter(), in document order, but without descending into the
+    mc:Fallback copy of alternate content.
+    """
+    stack = [node]
+    while stack:
+        element = stack.pop()
+        yield element
+        stack.extend(child for child in reversed(element) if child.tag != MC_FALLBACK)
+
+
+class _DocxWalker:
+    """
+    Walks the document body once, collecting text per page and unique images.
+
+    Pages follow the page breaks Word rendered when the file was last saved
+    (w:lastRenderedPageBreak). Files that never went through Word's layout
+    have none, so explicit page breaks, "page break before" paragraphs and
+    new-page section breaks are used instead.
+    """
+
+    def __init__(self, doc, extracted_data: PageBufferBuilder, image_processing_tasks: list):
+        self.related_parts = doc.part.related_parts
+        self.extracted_data = extracted_data
+        self.image_processing_tasks = image_processing_tasks
+        self.rendered_breaks = doc.element.body.find(".//" + W_LAST_RENDERED_PAGE_BREAK) is not None
+        self.page = 1
+        self.lines: List[str] = []
+        self.seen_images = set()
+        # Inside a table row, page breaks are counted and applied after the row
+        self.deferred_breaks: Optional[int] = None
+
+    def walk(self, body):
+        for element in body.iterchildren():
+            if element.tag == W_P:
+                self._paragraph(element)
+            elif element.tag == W_TBL:
+                self._table(element)
+        self._flush()
+
+    def _flush(self):
+        if self.lines:
+            self.extracted_data.add(self.page, "\n".join(self.lines))
+            self.lines = []
+
+    def _page_break(self, parts: List[str]):
+        """
+        Start a new page; text collected so far stays on the current one.
+        """
+        if self.deferred_breaks is not None:
+            self.deferred_breaks += 1
+            return
+        text = "".join(parts).strip()
+        if text:
+            self.lines.append(text)
+        parts.clear()
+        self._flush()
+        self.page += 1
+
+    def _image(self, rel_id: str):
+        """
+        Queue an image for OCR the first time its part is referenced.
+        """
+        part = self.related_parts.get(rel_id) if rel_id else None
+        if part is None or part.partname in self.seen_images:
+            return
+        self.seen_images.add(part.partname)
+        try:
+            image = Image.open(io.BytesIO(part.blob))
+        except Exception:
+            return  # Not a raster image PIL can read (e.g. EMF/WMF)
+        if image.size[0] > MIN_IMAGE_SIZE and image.size[1] > MIN_IMAGE_SIZE:
+            self.image_processing_tasks.append((image, str(self.page), len(self.image_processing_tasks)))
+
+    def _scan(self, node) -> str:
+        """
+        Text of a subtree, handling images and page breaks found along the way.
+        """
+        parts: List[str] = []
+        for child in _iter_content(node):
+            tag = child.tag
+            if tag == W_T:
+                parts.append(child.text or "")
+            elif tag == W_TAB:
+                parts.append("\t")
+            elif tag == W_BR:
+                if child.get(W_TYPE) == "page":
+                    if not self.rendered_breaks:
+                        self._page_break(parts)
+                else:
+                    parts.append("\n")
+            elif tag == W_CR:
+                parts.append("\n")
+            elif tag == W_LAST_RENDERED_PAGE_BREAK:
+                self._page_break(parts)
+            elif tag == A_BLIP:
+                self._image(child.get(R_EMBED))
+            elif tag == V_IMAGEDATA:
+                self._image(child.get(R_ID))
+        return "".join(parts).strip()
+
+    def _paragraph(self, element):
+        properties = element.find(W_PPR)
+        if (
+            properties is not None
+            and not self.rendered_breaks
+            and properties.find(W_PAGE_BREAK_BEFORE) is not None
+        ):
+            self._page_break([])
+
+        text = self._scan(element)
+        if text:
+            self.lines.append(text)
+
+        # A paragraph carrying sectPr ends its section
+        section = properties.find(W_SECTPR) if properties is not None else None
+        if section is not None and not self.rendered_breaks:
+            section_type = section.find(W_TYPE)
+            if section_type is None or section_type.get(W_VAL) != "continuous":
+                self._page_break([])
+
+    def _table(self, element):
+        """
+        Tables become one line per row with cells separated by " | ". A row is
+        kept on one page; page breaks inside it take effect after the row.
+        """
+        for row in element.iterchildren(W_TR):
+            self.deferred_breaks = 0
+            try:
+                cells = [self._scan(cell).replace("\n", " ") for cell in row.iterchildren(W_TC)]
+            finally:
+                breaks, self.deferred_breaks = self.deferred_breaks, None
+            if any(cells):
+                self.lines.append(" | ".join(cells))
+            for _ in range(breaks):
+                self._page_break([])
+
+
+def extract_docx(file_content: bytes, extracted_data: PageBufferBuilder, image_processing_tasks: list):
+    """
+    Extracts the text, tables and images of a DOCX file in a single pass.
+
+    Each image is resolved directly through its r:embed relationship id and
+    queued for OCR once, no matter how often it is referenced.
+
+    Args:
+    - file_content (bytes): The raw DOCX file.
+    - extracted_data (PageBufferBuilder): Receives one text entry per page.
+    - image_processing_tasks (list): Receives (image, page_no, img_index) tuples for OCR.
+    """
+    doc = DocxDocument(io.BytesIO(file_content))
+    _DocxWalker(doc, extracted_data, image_processing_tasks).walk(doc.element.body)
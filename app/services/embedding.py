@@ -0,0 +1,170 @@
+"""
+Embedding providers.
+
+With the default EMBEDDING_PROVIDER=weaviate, chunks and queries are vectorized
+inside Weaviate by the text2vec-openai module, which costs an OpenAI round trip
+per import batch and per query. With EMBEDDING_PROVIDER=local a
+sentence-transformers model is loaded once in this process and used for both:
+chunk vectors are computed in the ingestion pipeline and sent with the objects,
+and query vectors are passed to the hybrid search.
+
+The local provider needs `sentence-transformers` (and `sentence-transformers[onnx]`
+for EMBEDDING_BACKEND=onnx), which are not part of requirements.txt since the
+default setup does not load a model.
+"""
+import logging
+from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from config import (
+    EMBEDDING_PROVIDER,
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_DEVICE,
+    EMBEDDING_THREADS,
+    EMBEDDING_BATCH_TOKENS,
+    EMBEDDING_MAX_BATCH_SIZE,
+)
+
+PROVIDERS = ("weaviate", "local")
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider(ABC):
+    """
+    Computes vectors in this process instead of in Weaviate.
+    """
+    dimensions: int = 0
+
+    @abstractmethod
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed document chunks; row i of the result is the vector of texts[i].
+        """
+
+    @abstractmethod
+    def embed_queries(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed search queries; row i of the result is the vector of texts[i].
+        """
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0].tolist()
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Singleton wrapping a sentence-transformers model that runs on the CPU.
+
+    Texts are sorted by token count and grouped so that every batch pads to
+    about the same number of tokens: many short chunks go through in one large
+    batch, long ones in smaller batches.
+    """
+    _instance = None
+
+    def __new__(cls):
+        """
+        Create a singleton instance of the class, loading the model once.
+        """
+        if cls._instance is None:
+            cls._instance = super(LocalEmbeddingProvider, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        """
+        Load the model configured by EMBEDDING_MODEL.
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_PROVIDER=local requires the sentence-transformers package"
+            ) from e
+
+        if EMBEDDING_THREADS:
+            import torch
+            torch.set_num_threads(EMBEDDING_THREADS)
+
+        self.model = SentenceTransformer(EMBEDDING_MODEL, device=EMBEDDING_DEVICE, backend=EMBEDDING_BACKEND)
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+        # Models such as E5 or Nomic expect an instruction prefix on queries and/or documents
+        self.query_prompt = "query" if "query" in self.model.prompts else None
+        self.document_prompt = "document" if "document" in self.model.prompts else None
+        logger.info(
+            "Loaded embedding model %s (%d dims, %s backend on %s)",
+            EMBEDDING_MODEL, self.dimensions, EMBEDDING_BACKEND, EMBEDDING_DEVICE,
+        )
+
+    def _token_counts(self, texts: Sequence[str]) -> List[int]:
+        encoded = self.model.tokenizer(
+            list(texts),
+            truncation=True,
+            max_length=self.model.max_seq_length,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def _batches(self, texts: Sequence[str]) -> Iterator[List[int]]:
+        """
+        Group text indexes, longest first, so that (longest text x batch size)
+        stays within EMBEDDING_BATCH_TOKENS, with at most EMBEDDING_MAX_BATCH_SIZE texts.
+        """
+        counts = self._token_counts(texts)
+        order = sorted(range(len(texts)), key=counts.__getitem__, reverse=True)
+        batch: List[int] = []
+        longest = 1
+        for i in order:
+            if batch and (len(batch) >= EMBEDDING_MAX_BATCH_SIZE or (len(batch) + 1) * longest > EMBEDDING_BATCH_TOKENS):
+                yield batch
+                batch = []
+            if not batch:
+                longest = max(counts[i], 1)
+            batch.append(i)
+        if batch:
+            yield batch
+
+    def _embed(self, texts: Sequence[str], prompt_name: Optional[str] = None) -> np.ndarray:
+        vectors = np.empty((len(texts), self.dimensions), dtype=np.float32)
+        if not texts:
+            return vectors
+        for batch in self._batches(texts):
+            vectors[batch] = self.model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                prompt_name=prompt_name,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        return vectors
+
+    def embed_documents(self, texts: Sequence[str]) -> np.ndarray:
+        return self._embed(texts, prompt_name=self.document_prompt)
+
+    def embed_queries(self, texts: Sequence[str]) -> np.ndarray:
+        return self._embed(texts, prompt_name=self.query_prompt)
+
+
+def embedding_id() -> str:
+    """
+    Identifies where vectors come from, without loading any model.
+    """
+    if EMBEDDING_PROVIDER == "local":
+        return f"local:{EMBEDDING_MODEL}"
+    return "weaviate:text2vec-openai"
+
+
+def embedding_provider() -> Optional[EmbeddingProvider]:
+    """
+    The configured in-process provider, or None when Weaviate vectorizes.
+    """
+    if EMBEDDING_PROVIDER not in PROVIDERS:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {EMBEDDING_PROVIDER!r}, expected one of {PROVIDERS}")
+    if EMBEDDING_PROVIDER == "local":
+        return LocalEmbeddingProvider()
+    return None
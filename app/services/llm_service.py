@@ -1,3 +1,6 @@
+import json
+from typing import List
+
 from openai import OpenAI
 
 from config import OPENAI_API_KEY
@@ -57,4 +60,46 @@ class QueryEnhancer:
         # Extract the enhanced query and questions from the response
         enhanced_query = response.choices[0].message.content
         # print(enhanced_query)
-        return enhanced_query
\ No newline at end of file
+        return enhanced_query
+
+    def enhance_queries(self, user_queries: List[str]) -> List[str]:
+        """
+        Enhance several user queries with a single LLM call.
+
+        Args:
+            user_queries (List[str]): The original user queries.
+
+        Returns:
+            List[str]: One enhanced query per input, in the same order.
+
+        Raises:
+            ValueError: If the model does not return one enhancement per query.
+        """
+        system_prompt = """
+        You will receive a JSON list of user queries. For each query:
+        1. Expand the query with more details to make it more specific and informative.
+        2. Generate 3 related questions that could help explore the topic further.
+
+        Respond with a JSON object {"queries": [...]} containing exactly one string per
+        input query, in the same order: the enhanced query followed by the related questions.
+        """
+
+        response = self.client.chat.completions.create(
+            model="gpt-4o-mini",
+            response_format={"type": "json_object"},
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": json.dumps(user_queries)
+                }
+            ]
+            )
+
+        enhanced_queries = json.loads(response.choices[0].message.content).get("queries")
+        if not isinstance(enhanced_queries, list) or len(enhanced_queries) != len(user_queries):
+            raise ValueError("Batched enhancement returned a different number of queries")
+        return [str(query) for query in enhanced_queries]
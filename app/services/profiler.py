@@ -0,0 +1,431 @@
+"""
+Request profiling: per-stage timings, on-demand stack sampling and capture of
+slow requests into a bounded ring buffer.
+
+Every request gets a trace that records the stages marked with `stage(...)`.
+A single background thread samples a request when profiling was armed for it
+(`Profiler().arm`) or once it has run longer than PROFILE_SLOW_REQUEST_MS.
+Armed and slow requests are kept in the ring buffer and can be exported as
+speedscope JSON or collapsed stacks (the input format of flamegraph.pl / inferno).
+
+Requests share the event-loop thread, so samples are attributed per asyncio
+task rather than per thread. Each tick, every task of the request contributes
+one stack. A task that is running on the loop contributes the loop thread's
+stack, under a "[running task]" root. A suspended task contributes the chain
+of coroutines it is awaiting through, under "[awaiting task]". Samples are
+never taken from the loop's idle selector. Tasks created while a request is
+traced belong to it (see `Profiler.install`), and so do the worker threads
+running its `asyncio.to_thread` calls, sampled under "[worker thread]".
+
+While no request is in flight the sampler thread blocks on an event. While
+requests are in flight but none needs sampling, it sleeps until the earliest
+one would cross the slow threshold.
+"""
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import PROFILE_SLOW_REQUEST_MS, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_BUFFER_SIZE
+
+_current_trace: contextvars.ContextVar[Optional["RequestTrace"]] = contextvars.ContextVar("request_trace", default=None)
+
+# Frames from this file are the sampler's own and are dropped from stacks
+_PROFILER_FILE = os.path.abspath(__file__)
+
+
+class RequestTrace:
+    """
+    Timings and stack samples of one request.
+    """
+    __slots__ = (
+        "id", "method", "path", "loop", "loop_thread", "tasks", "threads",
+        "started_at", "started", "armed", "stages", "samples", "duration", "status",
+    )
+
+    def __init__(self, trace_id: int, method: str, path: str, armed: bool):
+        self.id = trace_id
+        self.method = method
+        self.path = path
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        # Tasks and worker threads doing work for this request
+        self.tasks = {asyncio.current_task()}
+        self.threads = set()
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.armed = armed
+        self.stages: List[Tuple[str, float, float]] = []
+        self.samples: Counter = Counter()
+        self.duration: Optional[float] = None
+        self.status: Optional[int] = None
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": str(self.started_at),
+            "duration_ms": round(self.duration * 1000, 3),
+            "reason": "armed" if self.armed else "slow",
+            "samples": sum(self.samples.values()),
+            "stages": [
+                {"name": name, "start_ms": round(start * 1000, 3), "duration_ms": round(duration * 1000, 3)}
+                for name, start, duration in self.stages
+            ],
+        }
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a stage of the current request, e.g. `with stage("ocr"): ...`.
+
+    Outside of a request this is a no-op.
+    """
+    trace = _current_trace.get()
+    # Tasks spawned by a request keep its context after the request finished
+    if trace is None or trace.duration is not None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.stages.append((name, started - trace.started, time.perf_counter() - started))
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+
+def _stack(frame, root=None) -> Tuple[str, ...]:
+    """
+    Root-to-leaf stack of a frame as "function (file:line)" strings, cut at
+    `root` (a task's outermost coroutine frame) or at a traced worker's entry.
+    """
+    stack = []
+    while frame is not None and frame.f_code is not _run_traced.__code__:
+        if frame.f_code.co_filename != _PROFILER_FILE:
+            stack.append(_frame_name(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _await_stack(coro) -> Tuple[str, ...]:
+    """
+    Root-to-leaf stack of a suspended task: its coroutine and the coroutines
+    it is awaiting through, down to the one waiting on a future.
+    """
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        if frame.f_code.co_filename != _PROFILER_FILE:
+            stack.append(_frame_name(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return tuple(stack)
+
+
+def _run_traced(trace: RequestTrace, fn, *args, **kwargs):
+    """
+    Run executor work, registering the worker thread with the request it serves.
+    """
+    ident = threading.get_ident()
+    trace.threads.add(ident)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        trace.threads.discard(ident)
+
+
+class _TracingExecutor(ThreadPoolExecutor):
+    """
+    Default executor of the loop; `asyncio.to_thread` submits from the
+    request's task, so the trace is known at submit time.
+    """
+
+    def submit(self, fn, /, *args, **kwargs):
+        trace = _current_trace.get()
+        if trace is None:
+            return super().submit(fn, *args, **kwargs)
+        return super().submit(_run_traced, trace, fn, *args, **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    Trace every request so slow or armed ones land in the profiling ring buffer.
+
+    A plain ASGI middleware, so the endpoint runs in the request's own task;
+    `@app.middleware("http")` would run it in a separate one.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/admin/profiling"):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = Profiler()
+        trace = profiler.start_request(scope["method"], scope["path"])
+        token = _current_trace.set(trace)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_trace.reset(token)
+            profiler.finish_request(trace, status)
+
+
+class Profiler:
+    """
+    Singleton tracking in-flight requests and the ring buffer of captured profiles.
+    """
+    _instance = None
+
+    def __new__(cls):
+        """
+        Create a singleton instance of the class.
+        """
+        if cls._instance is None:
+            cls._instance = super(Profiler, cls).__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.slow_threshold = PROFILE_SLOW_REQUEST_MS / 1000 if PROFILE_SLOW_REQUEST_MS > 0 else None
+        self.interval = PROFILE_SAMPLE_INTERVAL_MS / 1000
+        self.profiles: deque = deque(maxlen=PROFILE_BUFFER_SIZE)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._in_flight: Dict[int, RequestTrace] = {}
+        self._armed_requests = 0
+        self._armed_until = 0.0
+        self._wakeup = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        """
+        Attribute tasks created and `to_thread` work submitted while a request
+        is traced to that request. Call once from the application lifespan.
+        """
+        previous_factory = loop.get_task_factory()
+
+        def task_factory(loop, coro, **kwargs):
+            if previous_factory is not None:
+                task = previous_factory(loop, coro, **kwargs)
+            else:
+                task = asyncio.Task(coro, loop=loop, **kwargs)
+            context = kwargs.get("context")
+            trace = context.get(_current_trace) if context is not None else _current_trace.get()
+            if trace is not None and trace.duration is None:
+                trace.tasks.add(task)
+            return task
+
+        loop.set_task_factory(task_factory)
+        loop.set_default_executor(_TracingExecutor(thread_name_prefix="asyncio"))
+
+    def arm(self, requests: Optional[int] = None, seconds: Optional[float] = None) -> Dict:
+        """
+        Sample every request for the next `requests` requests and/or `seconds` seconds.
+        """
+        with self._lock:
+            if requests:
+                self._armed_requests = requests
+            if seconds:
+                self._armed_until = time.monotonic() + seconds
+        return self.status()
+
+    def status(self) -> Dict:
+        return {
+            "armed_requests": self._armed_requests,
+            "armed_seconds": max(0.0, self._armed_until - time.monotonic()),
+            "slow_request_ms": PROFILE_SLOW_REQUEST_MS,
+            "sample_interval_ms": PROFILE_SAMPLE_INTERVAL_MS,
+            "captured": len(self.profiles),
+            "buffer_size": self.profiles.maxlen,
+        }
+
+    def start_request(self, method: str, path: str) -> RequestTrace:
+        """
+        Begin tracing a request. The caller makes it the current trace of the
+        request's task, on the loop.
+        """
+        with self._lock:
+            armed = self._armed_requests > 0 or time.monotonic() < self._armed_until
+            if self._armed_requests > 0:
+                self._armed_requests -= 1
+            trace = RequestTrace(next(self._ids), method, path, armed)
+            if armed or self.slow_threshold is not None:
+                self._in_flight[trace.id] = trace
+                self._ensure_sampler()
+                self._wakeup.set()
+        return trace
+
+    def finish_request(self, trace: RequestTrace, status: int):
+        """
+        Stop tracing a request and keep it if it was armed or slow.
+        """
+        trace.duration = time.perf_counter() - trace.started
+        trace.status = status
+        with self._lock:
+            self._in_flight.pop(trace.id, None)
+        # Kept traces must not hold on to tasks
+        trace.tasks = set()
+        slow = self.slow_threshold is not None and trace.duration >= self.slow_threshold
+        if trace.armed or slow:
+            self.profiles.append(trace)
+
+    def get(self, trace_id: int) -> Optional[RequestTrace]:
+        return next((trace for trace in self.profiles if trace.id == trace_id), None)
+
+    def clear(self):
+        self.profiles.clear()
+
+    def _ensure_sampler(self):
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._run_sampler, name="request-profiler", daemon=True)
+            self._sampler.start()
+
+    def _run_sampler(self):
+        while True:
+            with self._lock:
+                traces = list(self._in_flight.values())
+                if not traces:
+                    self._wakeup.clear()
+            if not traces:
+                self._wakeup.wait()
+                continue
+
+            now = time.perf_counter()
+            due = [
+                trace for trace in traces
+                if trace.armed or now - trace.started >= self.slow_threshold
+            ]
+            if due:
+                frames = sys._current_frames()
+                for trace in due:
+                    self._sample(trace, frames)
+                del frames
+                timeout = self.interval
+            else:
+                # Nothing to sample until the oldest request becomes slow
+                timeout = min(trace.started + self.slow_threshold for trace in traces) - now
+            # Woken early when a new request starts, so armed requests are sampled promptly
+            self._wakeup.wait(max(timeout, self.interval))
+            self._wakeup.clear()
+
+
+    @staticmethod
+    def _sample(trace: RequestTrace, frames: Dict):
+        """
+        Record one stack per live task and per busy worker thread of a request.
+        """
+        running = asyncio.current_task(trace.loop)
+        for task in list(trace.tasks):
+            if task.done():
+                continue
+            coro = task.get_coro()
+            if task is running:
+                frame = frames.get(trace.loop_thread)
+                if frame is None:
+                    continue
+                stack = ("[running task]",) + _stack(frame, root=getattr(coro, "cr_frame", None))
+            else:
+                stack = ("[awaiting task]",) + _await_stack(coro)
+            trace.samples[stack] += 1
+        for ident in tuple(trace.threads):
+            frame = frames.get(ident)
+            if frame is not None:
+                trace.samples[("[worker thread]",) + _stack(frame)] += 1
+
+
+def to_collapsed(trace: RequestTrace) -> str:
+    """
+    Collapsed stacks ("frame;frame;frame count" per line) for flamegraph tools.
+    """
+    return "".join(
+        ";".join(frame.replace(";", ":") for frame in stack) + f" {count}\n"
+        for stack, count in trace.samples.items()
+    )
+
+
+def to_speedscope(trace: RequestTrace) -> str:
+    """
+    A speedscope file with the sampled stacks and the stage timeline of a request.
+    """
+    frames: List[Dict] = []
+    index: Dict[str, int] = {}
+
+    def frame_id(name: str) -> int:
+        if name not in index:
+            index[name] = len(frames)
+            function, _, location = name.partition(" (")
+            file, _, line = location.rstrip(")").rpartition(":")
+            frames.append({"name": function, "file": file, "line": int(line)} if file else {"name": name})
+        return index[name]
+
+    interval_ms = PROFILE_SAMPLE_INTERVAL_MS
+    duration_ms = trace.duration * 1000
+    samples = [[frame_id(name) for name in stack] for stack in trace.samples]
+    weights = [count * interval_ms for count in trace.samples.values()]
+
+    events = []
+    for name, start, duration in trace.stages:
+        frame = frame_id(f"stage: {name}")
+        events.append({"type": "O", "frame": frame, "at": start * 1000})
+        events.append({"type": "C", "frame": frame, "at": (start + duration) * 1000})
+    # Closing events sort before opening ones at the same instant
+    events.sort(key=lambda event: (event["at"], event["type"] == "O"))
+
+    title = f"{trace.method} {trace.path} #{trace.id}"
+    return json.dumps({
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": title,
+        "exporter": "ringgai-profiler",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": f"{title} stacks",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            },
+            {
+                "type": "evented",
+                "name": f"{title} stages",
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": duration_ms,
+                "events": events,
+            },
+        ],
+    })
@@ -0,0 +1,309 @@
+"""
+Export and import of the Document collection, vectors included, so it can be
+migrated or restored without re-parsing, OCR or re-embedding.
+
+A snapshot is a directory:
+
+    snapshot.json           format version, vector dimensions, shard list and
+                            the version manifests of the exported documents
+    objects-00000.jsonl     one {"uuid", "properties"} line per chunk
+    vectors-00000.npy       float32 matrix, row i is the vector of line i
+
+Usage, from the `app/` directory:
+
+    python -m services.snapshot export snapshots/2025-02-26 [--doc-id ID ...]
+    python -m services.snapshot import snapshots/2025-02-26
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set
+
+import numpy as np
+
+from config import (
+    SNAPSHOT_DIR,
+    WEAVIATE_CLASS_NAME,
+    WEAVIATE_VECTOR_NAME,
+    SNAPSHOT_SHARD_SIZE,
+    SNAPSHOT_BATCH_SIZE,
+    SNAPSHOT_BATCH_CONCURRENCY,
+)
+from services.embedding import embedding_id
+from services.weaviate import WeaviateService, OPEN_VERSION, Filter
+from utils.hash_generator import generate_manifest_uuid
+
+SNAPSHOT_FORMAT = 1
+MANIFEST_FILE = "snapshot.json"
+PAGE_SIZE = 1000
+
+
+class _ShardWriter:
+    """
+    Buffers exported objects and flushes them as numbered shard files.
+    """
+
+    def __init__(self, path: str, shard_size: int):
+        self.path = path
+        self.shard_size = shard_size
+        self.shards: List[Dict] = []
+        self.count = 0
+        self.dims: Optional[int] = None
+        self._lines: List[str] = []
+        self._vectors: List[List[float]] = []
+
+    def add(self, uuid: str, properties: Dict, vector: List[float]):
+        if self.dims is None:
+            self.dims = len(vector)
+        elif len(vector) != self.dims:
+            raise ValueError(f"Object {uuid} has a {len(vector)}-dim vector, expected {self.dims}")
+        self._lines.append(json.dumps({"uuid": uuid, "properties": properties}))
+        self._vectors.append(vector)
+        if len(self._lines) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self._lines:
+            return
+        index = len(self.shards)
+        objects_file = f"objects-{index:05d}.jsonl"
+        vectors_file = f"vectors-{index:05d}.npy"
+        with open(os.path.join(self.path, objects_file), "w") as f:
+            f.write("\n".join(self._lines))
+            f.write("\n")
+        np.save(os.path.join(self.path, vectors_file), np.asarray(self._vectors, dtype=np.float32))
+
+        self.shards.append({"objects": objects_file, "vectors": vectors_file, "count": len(self._lines)})
+        self.count += len(self._lines)
+        self._lines, self._vectors = [], []
+
+
+def _vector_of(obj) -> Optional[List[float]]:
+    vector = obj.vector.get(WEAVIATE_VECTOR_NAME) if isinstance(obj.vector, dict) else obj.vector
+    return vector or None
+
+
+def _is_visible(properties: Dict, manifests: Dict[str, Dict]) -> bool:
+    """
+    Whether a chunk belongs to the active version of its document.
+    """
+    manifest = manifests.get(properties.get("docId"))
+    if manifest is None:
+        return True  # Stored before versioning
+    active = manifest["activeVersion"]
+    from_version, to_version = properties.get("fromVersion"), properties.get("toVersion")
+    return from_version is not None and to_version is not None and from_version <= active < to_version
+
+
+def _iter_collection(service: WeaviateService) -> Iterator:
+    """
+    Walk the whole collection with the cursor iterator.
+    """
+    return service.docs.iterator(include_vector=True, cache_size=PAGE_SIZE)
+
+
+def _iter_documents(service: WeaviateService, doc_ids: List[str]) -> Iterator:
+    """
+    Walk the active chunks of the given documents with filtered, paged fetches.
+    """
+    for doc_id in doc_ids:
+        yield from service.fetch_all(
+            service.docs, service.query_filter(doc_id), page_size=PAGE_SIZE, include_vector=True,
+        )
+
+
+def snapshot_path(name: str) -> str:
+    """
+    Resolve a snapshot name to its directory, which must lie inside SNAPSHOT_DIR.
+    """
+    root = os.path.realpath(SNAPSHOT_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"Snapshot name {name!r} does not resolve to a directory inside {SNAPSHOT_DIR}")
+    return path
+
+
+def export_snapshot(path: str, doc_ids: Optional[List[str]] = None, shard_size: int = SNAPSHOT_SHARD_SIZE) -> Dict:
+    """
+    Stream the collection, or the active chunks of `doc_ids`, to a snapshot directory.
+
+    Args:
+    - path (str): Directory to write the snapshot to. Must not exist or be empty.
+    - doc_ids (Optional[List[str]]): Only export these documents.
+    - shard_size (int): Number of objects per shard file.
+
+    Returns:
+    - Dict: The snapshot manifest.
+    """
+    os.makedirs(path, exist_ok=True)
+    if os.listdir(path):
+        raise ValueError(f"Snapshot directory {path} is not empty")
+
+    service = WeaviateService()
+    started = time.perf_counter()
+
+    # Only the active version is exported, so imported documents are settled
+    manifests = {
+        obj.properties["docId"]: {**obj.properties, "pendingVersion": 0}
+        for obj in service.versions.iterator(cache_size=PAGE_SIZE)
+        if doc_ids is None or obj.properties["docId"] in doc_ids
+    }
+    objects = _iter_collection(service) if doc_ids is None else _iter_documents(service, doc_ids)
+
+    writer = _ShardWriter(path, shard_size)
+    skipped = 0
+    for obj in objects:
+        vector = _vector_of(obj)
+        if vector is None or not _is_visible(obj.properties, manifests):
+            skipped += 1
+            continue
+        manifest = manifests.get(obj.properties.get("docId"))
+        if manifest is not None:
+            # A chunk retired by a failed write ends before OPEN_VERSION; the
+            # settled snapshot has it open from the active version on
+            obj.properties.update(fromVersion=manifest["activeVersion"], toVersion=OPEN_VERSION)
+        writer.add(str(obj.uuid), obj.properties, vector)
+    writer.flush()
+
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "collection": WEAVIATE_CLASS_NAME,
+        "vector_name": WEAVIATE_VECTOR_NAME,
+        "embedding": embedding_id(),
+        "dims": writer.dims,
+        "count": writer.count,
+        "skipped": skipped,
+        "created_at": str(datetime.now()),
+        "seconds": time.perf_counter() - started,
+        "shards": writer.shards,
+        "documents": list(manifests.values()),
+    }
+    with open(os.path.join(path, MANIFEST_FILE), "w") as f:
+        json.dump(snapshot, f, indent=2)
+    return snapshot
+
+
+def import_snapshot(path: str) -> Dict:
+    """
+    Bulk-load a snapshot back into Weaviate with explicit vectors.
+
+    Objects keep their UUIDs, so importing over an existing collection upserts.
+    Chunks of the imported documents that are not in the snapshot are deleted,
+    so each document is exactly as it was exported. Because every object
+    carries its vector, the vectorizer is never called.
+
+    Args:
+    - path (str): The snapshot directory.
+
+    Returns:
+    - Dict: Counts and timing of the import.
+    """
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        snapshot = json.load(f)
+    if snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {snapshot.get('format')}")
+    # Snapshots taken before embedding providers existed hold text2vec-openai vectors
+    embedding = snapshot.get("embedding", "weaviate:text2vec-openai")
+    if embedding != embedding_id():
+        raise ValueError(f"Snapshot vectors come from {embedding}, but this server embeds with {embedding_id()}")
+
+    service = WeaviateService()
+    if service.embedder is not None and snapshot.get("dims") not in (None, service.embedder.dimensions):
+        raise ValueError(
+            f"Snapshot vectors have {snapshot['dims']} dimensions, the embedding model {service.embedder.dimensions}"
+        )
+    # Recreates the collections if they were deleted
+    service._check_collection()
+    started = time.perf_counter()
+
+    imported = 0
+    snapshot_uuids: Dict[str, Set[str]] = defaultdict(set)
+    with service.docs.batch.fixed_size(
+        batch_size=SNAPSHOT_BATCH_SIZE,
+        concurrent_requests=SNAPSHOT_BATCH_CONCURRENCY,
+    ) as batch:
+        for shard in snapshot["shards"]:
+            vectors = np.load(os.path.join(path, shard["vectors"]), mmap_mode="r")
+            with open(os.path.join(path, shard["objects"])) as f:
+                for row, line in enumerate(f):
+                    obj = json.loads(line)
+                    if obj["properties"].get("toVersion") is None:
+                        # Exported before versioning: current in every version
+                        obj["properties"].update(fromVersion=0, toVersion=OPEN_VERSION)
+                    batch.add_object(
+                        properties=obj["properties"],
+                        uuid=obj["uuid"],
+                        vector={snapshot["vector_name"]: vectors[row]},
+                    )
+                    snapshot_uuids[obj["properties"]["docId"]].add(obj["uuid"])
+                    imported += 1
+
+    failed = service.docs.batch.failed_objects
+    if failed:
+        raise Exception(f"{len(failed)} objects failed to import: {failed[0].message}")
+
+    # Chunks written after the export would otherwise mix with the restored version
+    manifests = {manifest["docId"]: manifest for manifest in snapshot["documents"]}
+    deleted = 0
+    for doc_id in set(snapshot_uuids) | set(manifests):
+        stale = [
+            str(obj.uuid) for obj in service.fetch_all(
+                service.docs, Filter.by_property("docId").equal(doc_id), return_properties=[],
+            )
+            if str(obj.uuid) not in snapshot_uuids[doc_id]
+        ]
+        if stale:
+            service.docs.data.delete_many(where=Filter.by_id().contains_any(stale))
+            deleted += len(stale)
+        if doc_id not in manifests:
+            # Exported before it was versioned: its chunks are all current again
+            service.versions.data.delete_by_id(generate_manifest_uuid(doc_id))
+
+    # Publish the version manifests last, once all chunks they point at exist
+    with service.versions.batch.fixed_size(batch_size=SNAPSHOT_BATCH_SIZE) as batch:
+        for manifest in manifests.values():
+            batch.add_object(properties=manifest, uuid=generate_manifest_uuid(manifest["docId"]))
+
+    failed = service.versions.batch.failed_objects
+    if failed:
+        raise Exception(
+            f"{imported} objects imported, but {len(failed)} document manifests failed: {failed[0].message}"
+        )
+
+    return {
+        "imported": imported,
+        "deleted": deleted,
+        "documents": len(snapshot["documents"]),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import Document collection snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write a snapshot of the collection")
+    export_parser.add_argument("path", help="Snapshot directory to create")
+    export_parser.add_argument("--doc-id", action="append", dest="doc_ids", help="Only export this document (repeatable)")
+    export_parser.add_argument("--shard-size", type=int, default=SNAPSHOT_SHARD_SIZE)
+    import_parser = commands.add_parser("import", help="Load a snapshot into the collection")
+    import_parser.add_argument("path", help="Snapshot directory to read")
+    args = parser.parse_args()
+
+    service = WeaviateService()
+    service.connect()
+    try:
+        if args.command == "export":
+            result = export_snapshot(args.path, args.doc_ids, args.shard_size)
+            result = {key: value for key, value in result.items() if key not in ("shards", "documents")}
+        else:
+            result = import_snapshot(args.path)
+        print(json.dumps(result, indent=2))
+    finally:
+        service.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from typing import Dict, Optional
+import weaviate.classes as wvc
+
+from config import VECTOR_INDEX
+
+INDEX_TYPES = ("hnsw", "flat", "dynamic")
+QUANTIZERS = ("none", "pq", "bq", "sq")
+
+
+def _set_values(section: Optional[Dict]) -> Dict:
+    """
+    Drop unset values so Weaviate falls back to its own defaults for them.
+
+    Args:
+    - section (Optional[Dict]): A block of settings from the index configuration.
+
+    Returns:
+    - Dict: The settings that were explicitly set.
+    """
+    return {key: value for key, value in (section or {}).items() if value is not None}
+
+
+def _distance(settings: Dict):
+    """
+    Resolve the configured distance metric, if any.
+    """
+    distance = settings.get("distance")
+    return wvc.config.VectorDistances(distance) if distance else None
+
+
+def _quantizer_name(settings: Dict) -> str:
+    """
+    The configured quantizer, normalised to lower case.
+    """
+    return (settings.get("quantizer") or "none").lower()
+
+
+def build_quantizer(settings: Dict, index_type: str):
+    """
+    Build the quantizer (compression) configuration for a vector index.
+
+    Args:
+    - settings (Dict): Index settings shaped like `config.VECTOR_INDEX`.
+    - index_type (str): The index the quantizer is attached to.
+
+    Returns:
+    - The Weaviate quantizer configuration, or None for uncompressed vectors.
+    """
+    quantizer = _quantizer_name(settings)
+    if quantizer not in QUANTIZERS:
+        raise ValueError(f"Unknown vector quantizer '{quantizer}', expected one of {QUANTIZERS}")
+    if quantizer == "none":
+        return None
+    if index_type == "flat" and quantizer != "bq":
+        raise ValueError("A flat index only supports binary quantization (bq)")
+
+    factory = getattr(wvc.config.Configure.VectorIndex.Quantizer, quantizer)
+    return factory(**_set_values(settings.get(quantizer)))
+
+
+def _hnsw(settings: Dict, quantizer=None):
+    return wvc.config.Configure.VectorIndex.hnsw(
+        distance_metric=_distance(settings),
+        quantizer=quantizer,
+        **_set_values(settings.get("hnsw")),
+    )
+
+
+def _flat(settings: Dict, quantizer=None):
+    return wvc.config.Configure.VectorIndex.flat(
+        distance_metric=_distance(settings),
+        quantizer=quantizer,
+        **_set_values(settings.get("flat")),
+    )
+
+
+def build_vector_index_config(settings: Optional[Dict] = None):
+    """
+    Build the vector index configuration used when creating a collection.
+
+    For a dynamic index the quantizer is applied to both the flat stage and the
+    HNSW stage it upgrades to; since flat only supports BQ, other quantizers are
+    applied to the HNSW stage alone.
+
+    Args:
+    - settings (Optional[Dict]): Index settings shaped like `config.VECTOR_INDEX`.
+      Defaults to the application configuration.
+
+    Returns:
+    - The Weaviate vector index configuration.
+    """
+    settings = VECTOR_INDEX if settings is None else settings
+    index_type = (settings.get("type") or "hnsw").lower()
+
+    if index_type == "hnsw":
+        return _hnsw(settings, build_quantizer(settings, "hnsw"))
+    if index_type == "flat":
+        return _flat(settings, build_quantizer(settings, "flat"))
+    if index_type == "dynamic":
+        hnsw_quantizer = build_quantizer(settings, "hnsw")
+        flat_quantizer = hnsw_quantizer if _quantizer_name(settings) == "bq" else None
+        return wvc.config.Configure.VectorIndex.dynamic(
+            distance_metric=_distance(settings),
+            hnsw=_hnsw(settings, hnsw_quantizer),
+            flat=_flat(settings, flat_quantizer),
+            **_set_values(settings.get("dynamic")),
+        )
+
+    raise ValueError(f"Unknown vector index type '{index_type}', expected one of {INDEX_TYPES}")
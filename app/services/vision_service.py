@@ -1,10 +1,12 @@
 import io
+import logging
 import aiohttp
 
 import asyncio
 
 from config import AZURE_VISION_ENDPOINT,AZURE_VISION_KEY
 
+logger = logging.getLogger(__name__)
 
 AZURE_HEADERS = {
     'Content-Type': 'application/octet-stream',
@@ -57,11 +59,11 @@ async def azure_ocr(session,image):
                 
                 return text.strip()
             else:
-                print(f"Azure OCR Error: {response.status}, {await response.text()}")
+                logger.warning("Azure OCR Error: %s, %s", response.status, await response.text())
                 return f"OCR Error: {response.status}"
     
     except Exception as e:
-        print(f"Azure OCR processing error: {e}")
+        logger.warning("Azure OCR processing error: %s", e)
         return "OCR processing error"
 
 async def azure_image_caption(session,image):
@@ -110,11 +112,11 @@ async def azure_image_caption(session,image):
                 else:
                     return "No caption generated"
             else:
-                print(f"Azure Caption Error: {response.status}, {await response.text()}")
+                logger.warning("Azure Caption Error: %s, %s", response.status, await response.text())
                 return f"Caption Error: {response.status}"
     
     except Exception as e:
-        print(f"Azure caption generation error: {e}")
+        logger.warning("Azure caption generation error: %s", e)
         return "Caption generation error"
 
 async def process_image(session,image_data):
@@ -1,21 +1,62 @@
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import weaviate
 from weaviate.classes.init import Auth
 import weaviate.classes as wvc
 from models.api import QueryResponse, TextSnippet
-from typing import List, Dict, Optional
+from services.chunking import ChunkTable
+from services.embedding import embedding_provider
+from services.profiler import stage
+from services.vector_index import build_vector_index_config
+from utils.hash_generator import generate_manifest_uuid
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple
 import json
 
 from config import (
     WEAVIATE_URL,
     OPENAI_API_KEY,
     WEAVIATE_CLASS_NAME,
-    WEAVIATE_API_KEY
+    WEAVIATE_VECTOR_NAME,
+    WEAVIATE_VERSION_CLASS_NAME,
+    WEAVIATE_API_KEY,
+    WEAVIATE_BATCH_SIZE,
+    WEAVIATE_BATCH_CONCURRENCY,
+    VERSION_GC_DELAY_SECONDS,
+    WEAVIATE_QUERY_MAXIMUM_RESULTS,
+    WEAVIATE_UPDATE_CONCURRENCY,
+    EMBEDDING_PROVIDER
 )
 
+# toVersion of chunks that are still part of the latest version of their document
+OPEN_VERSION = 2**31 - 1
+
+Filter = wvc.query.Filter
+
+logger = logging.getLogger(__name__)
+
 
 class WeaviateService:
     """
     Singleton class for interacting with Weaviate.
+
+    Chunks are versioned per document: every chunk carries the half-open range
+    [fromVersion, toVersion) of document versions it belongs to, and a manifest
+    object in the version collection holds the active version of each document.
+    Queries only see chunks whose range contains the active version, so a
+    re-upload becomes visible in one step when the manifest is flipped.
+
+    While no write is in flight, exactly the chunks with toVersion ==
+    OPEN_VERSION are visible. The manifest records a pendingVersion for the
+    duration of a write (and after a failed one), and only those documents need
+    a per-document filter in queries across all documents.
+
+    Documents stored before versioning have no version range yet. They are
+    adopted as version 0 by a background migration, and until then queries
+    across all documents match them by docId.
     """
     _instance = None
 
@@ -26,6 +67,12 @@ class WeaviateService:
         if cls._instance is None:
             cls._instance = super(WeaviateService, cls).__new__(cls)
             cls._instance.client = None
+            cls._instance.embedder = None
+            cls._instance._document_locks = defaultdict(asyncio.Lock)
+            cls._instance._gc_tasks = set()
+            cls._instance._unversioned_docs = frozenset()
+            cls._instance._unversioned_lock = threading.Lock()
+            cls._instance._migration = None
         return cls._instance
 
     def connect(self):
@@ -33,6 +80,8 @@ class WeaviateService:
         Connect to the Weaviate instance.
         """
         if self.client is None:
+            # Loads the local embedding model, if one is configured
+            self.embedder = embedding_provider()
             self.client = weaviate.connect_to_weaviate_cloud(
                 cluster_url=WEAVIATE_URL,
                 auth_credentials=Auth.api_key(WEAVIATE_API_KEY),
@@ -46,6 +95,9 @@ class WeaviateService:
         """
         Disconnect from the Weaviate instance.
         """
+        if self._migration is not None:
+            self._migration.cancel()
+            self._migration = None
         if self.client is not None:
             self.client.close()
             self.client = None
@@ -69,67 +121,466 @@ class WeaviateService:
                         wvc.config.Property(name="chunkDataType", data_type=wvc.config.DataType.TEXT),
                         wvc.config.Property(name="chunkData", data_type=wvc.config.DataType.TEXT),
                         wvc.config.Property(name="fileType", data_type=wvc.config.DataType.TEXT),
+                        wvc.config.Property(name="fromVersion", data_type=wvc.config.DataType.INT),
+                        wvc.config.Property(name="toVersion", data_type=wvc.config.DataType.INT),
                     ],
-                    vectorizer_config=[
-        wvc.config.Configure.NamedVectors.text2vec_openai(
-            name="chunkData",
-            source_properties=["chunkData"],
-            vector_index_config=wvc.config.Configure.VectorIndex.hnsw()
-        ),
-    ],
+                    vectorizer_config=[self._vector_config()],
                     generative_config=wvc.config.Configure.Generative.openai(
                         model='gpt-4o',
                         max_tokens=1024
                         ),
                     )
+            else:
+                config = self.docs.config.get()
+                vector_config = (config.vector_config or {}).get(WEAVIATE_VECTOR_NAME)
+                if vector_config is not None:
+                    # Vectors from different providers are not comparable
+                    local_vectors = vector_config.vectorizer.vectorizer == wvc.config.Vectorizers.NONE
+                    if local_vectors != (self.embedder is not None):
+                        raise Exception(
+                            f"collection {WEAVIATE_CLASS_NAME} was created for "
+                            f"{'local' if local_vectors else 'Weaviate'} vectorization but "
+                            f"EMBEDDING_PROVIDER is {EMBEDDING_PROVIDER}; delete the collection "
+                            f"and re-upload the documents after switching providers"
+                        )
+
+                # Collections created before versioning lack the version range
+                existing = {prop.name for prop in config.properties}
+                for name in ("fromVersion", "toVersion"):
+                    if name not in existing:
+                        self.docs.config.add_property(
+                            wvc.config.Property(name=name, data_type=wvc.config.DataType.INT)
+                        )
+
+            self.versions = self.client.collections.get(name=WEAVIATE_VERSION_CLASS_NAME)
+            if not self.versions.exists():
+                self.versions = self.client.collections.create(
+                    name=WEAVIATE_VERSION_CLASS_NAME,
+                    properties=[
+                        wvc.config.Property(name="docId", data_type=wvc.config.DataType.TEXT),
+                        wvc.config.Property(name="activeVersion", data_type=wvc.config.DataType.INT),
+                        wvc.config.Property(name="pendingVersion", data_type=wvc.config.DataType.INT),
+                        wvc.config.Property(
+                            name="chunkIds",
+                            data_type=wvc.config.DataType.TEXT_ARRAY,
+                            index_filterable=False,
+                            index_searchable=False,
+                        ),
+                        wvc.config.Property(name="updatedAt", data_type=wvc.config.DataType.TEXT),
+                    ],
+                    vectorizer_config=wvc.config.Configure.Vectorizer.none(),
+                )
+            elif "pendingVersion" not in {prop.name for prop in self.versions.config.get().properties}:
+                self.versions.config.add_property(
+                    wvc.config.Property(name="pendingVersion", data_type=wvc.config.DataType.INT)
+                )
+
+            self._unversioned_docs = self._find_unversioned_documents()
                 
         except Exception as e:
             raise Exception(f"Failed to ensure Weaviate schema: {str(e)}")
 
-    async def store_document(self,doc_id:str,chunks:List, metadata: Dict):
+    def _vector_config(self):
+        """
+        The named vector of the collection: vectorized by Weaviate's
+        text2vec-openai module, or supplied by the local embedding provider.
+        """
+        if self.embedder is not None:
+            return wvc.config.Configure.NamedVectors.none(
+                name=WEAVIATE_VECTOR_NAME,
+                vector_index_config=build_vector_index_config(),
+            )
+        return wvc.config.Configure.NamedVectors.text2vec_openai(
+            name=WEAVIATE_VECTOR_NAME,
+            source_properties=["chunkData"],
+            vector_index_config=build_vector_index_config(),
+        )
+
+    def _find_unversioned_documents(self) -> frozenset:
+        """
+        The documents with chunks stored before versioning, which lack a version
+        range. Only looks them up when some chunk lacks a toVersion.
+        """
+        total = self.docs.aggregate.over_all(total_count=True).total_count
+        versioned = self.docs.aggregate.over_all(
+            filters=Filter.by_property("toVersion").greater_or_equal(0),
+            total_count=True,
+        ).total_count
+        if total == versioned:
+            return frozenset()
+
+        # A document is adopted (stamped) before its manifest is written
+        groups = self.docs.aggregate.over_all(
+            group_by=wvc.aggregate.GroupByAggregate(prop="docId", limit=total),
+            total_count=True,
+        ).groups
+        adopted = {obj.properties["docId"] for obj in self.versions.iterator(return_properties=["docId"])}
+        unversioned = frozenset(group.grouped_by.value for group in groups) - adopted
+        logger.info("%d chunks of %d documents were stored before versioning", total - versioned, len(unversioned))
+        return unversioned
+
+    def start_migration(self):
         """
-        Store document chunks in Weaviate.
+        Adopt the documents stored before versioning in the background, so a
+        large collection does not hold up startup. Requires a running event loop.
+        """
+        if self._unversioned_docs and self._migration is None:
+            self._migration = asyncio.create_task(self._adopt_unversioned_documents())
+
+    async def _adopt_unversioned_documents(self):
+        """
+        Adopt the unversioned documents one at a time, each under its lock so
+        that it cannot interleave with a write of the same document. Documents
+        that fail stay unversioned and are retried on the next start.
+        """
+        for doc_id in sorted(self._unversioned_docs):
+            try:
+                async with self._document_locks[doc_id]:
+                    # Uploads and deletes adopt or drop documents themselves
+                    if doc_id in self._unversioned_docs:
+                        await asyncio.to_thread(self._adopt_unversioned_chunks, doc_id)
+            except Exception as e:
+                logger.warning("Versioning migration failed for %s: %s", doc_id, e)
+        logger.info("Versioning migration finished, %d documents left", len(self._unversioned_docs))
+        self._migration = None
+
+    def _update_objects(self, updates: Iterable[Tuple[str, Dict]]):
+        """
+        Apply property updates to chunks, WEAVIATE_UPDATE_CONCURRENCY requests at
+        a time. Weaviate has no batched partial update, and a batched upsert
+        would need the vectors.
+        """
+        with ThreadPoolExecutor(max_workers=WEAVIATE_UPDATE_CONCURRENCY) as pool:
+            for _ in pool.map(lambda update: self.docs.data.update(uuid=update[0], properties=update[1]), updates):
+                pass
+
+    def fetch_all(self, collection, filters, page_size: int = 1000, **kwargs) -> Iterator:
+        """
+        Yield every object of `collection` matching `filters`, page by page.
+
+        Filtered fetches can only page with offsets, which Weaviate caps at
+        QUERY_MAXIMUM_RESULTS. Rather than silently stopping at the cap, this
+        raises once it is reached.
+        """
+        offset = 0
+        while True:
+            limit = min(page_size, WEAVIATE_QUERY_MAXIMUM_RESULTS - offset)
+            result = collection.query.fetch_objects(filters=filters, limit=limit, offset=offset, **kwargs)
+            yield from result.objects
+            if len(result.objects) < limit:
+                return
+            offset += limit
+            if offset >= WEAVIATE_QUERY_MAXIMUM_RESULTS:
+                raise Exception(
+                    f"at least {WEAVIATE_QUERY_MAXIMUM_RESULTS} objects match the filter; raise "
+                    f"QUERY_MAXIMUM_RESULTS on the Weaviate server and WEAVIATE_QUERY_MAXIMUM_RESULTS to match"
+                )
+
+    def _get_manifest(self, doc_id: str) -> Optional[Dict]:
+        """
+        Fetch the version manifest of a document, or None if it was never versioned.
+        """
+        manifest = self.versions.query.fetch_object_by_id(generate_manifest_uuid(doc_id))
+        return manifest.properties if manifest is not None else None
+
+    def _save_manifest(self, doc_id: str, version: int, chunk_ids: List[str], exists: bool, pending: int = 0):
+        """
+        Point a document at a new active version. This single-object write is the
+        atomic switch between versions.
+
+        `pending` is the version being written, or 0 once the document is settled.
+        """
+        properties = {
+            "docId": doc_id,
+            "activeVersion": version,
+            "pendingVersion": pending,
+            "chunkIds": chunk_ids,
+            "updatedAt": str(datetime.now()),
+        }
+        uuid = generate_manifest_uuid(doc_id)
+        if exists:
+            self.versions.data.replace(uuid=uuid, properties=properties)
+        else:
+            self.versions.data.insert(properties=properties, uuid=uuid)
+
+    def _visible_filter(self, doc_id: str, version: int):
+        """
+        Filter for the chunks of `doc_id` that belong to `version`.
+        """
+        return Filter.all_of([
+            Filter.by_property("docId").equal(doc_id),
+            Filter.by_property("fromVersion").less_or_equal(version),
+            Filter.by_property("toVersion").greater_than(version),
+        ])
+
+    def query_filter(self, document_id: Optional[str]):
+        """
+        Filter restricting a query to the active version of one or all documents.
+        """
+        if document_id is not None:
+            manifest = self._get_manifest(document_id)
+            if manifest is None:
+                # Stored before versioning: every chunk of the document is current
+                return Filter.by_property("docId").equal(document_id)
+            return self._visible_filter(document_id, manifest["activeVersion"])
+
+        settled = Filter.by_property("toVersion").equal(OPEN_VERSION)
+        unversioned = self._unversioned_docs
+        if unversioned:
+            # Not adopted by the migration yet: every chunk of these is current
+            settled = settled | Filter.by_property("docId").contains_any(list(unversioned))
+        writing = [
+            manifest.properties for manifest in self.fetch_all(
+                self.versions,
+                Filter.by_property("pendingVersion").greater_than(0),
+                return_properties=["docId", "activeVersion"],
+            )
+        ]
+        if not writing:
+            return settled
+        # Documents with a write in flight (or a failed one) are resolved through their manifest
+        return Filter.any_of(
+            [Filter.all_of([settled] + [Filter.by_property("docId").not_equal(m["docId"]) for m in writing])]
+            + [self._visible_filter(m["docId"], m["activeVersion"]) for m in writing]
+        )
+
+    def _adopt_unversioned_chunks(self, doc_id: str) -> List[str]:
+        """
+        Turn the chunks of a document stored before versioning into its version 0
+        and publish that version, so a new version can be written next to it.
+        Must be called under the document lock.
+
+        Returns:
+        - List[str]: The IDs of the adopted chunks.
+        """
+        objects = list(self.fetch_all(
+            self.docs, Filter.by_property("docId").equal(doc_id), return_properties=["toVersion"]
+        ))
+        self._update_objects(
+            (obj.uuid, {"fromVersion": 0, "toVersion": OPEN_VERSION})
+            for obj in objects if obj.properties.get("toVersion") != OPEN_VERSION
+        )
+        ids = [str(obj.uuid) for obj in objects]
+        self._save_manifest(doc_id, 0, ids, exists=False)
+        self._forget_unversioned(doc_id)
+        return ids
+
+    def _forget_unversioned(self, doc_id: str):
+        """
+        Stop matching a document by docId in queries across all documents.
+        """
+        # Readers take the current frozenset without locking; writers swap it
+        with self._unversioned_lock:
+            self._unversioned_docs = self._unversioned_docs - {doc_id}
+
+    def _reset_interrupted_write(self, doc_id: str, pending: int, keep: set):
+        """
+        Undo what a failed write of `pending` left behind: reopen retired chunks
+        the new upload still contains, and delete chunks it added that the new
+        upload no longer contains (they were never visible).
+        """
+        reopened = []
+        for obj in self.fetch_all(
+            self.docs,
+            Filter.by_property("docId").equal(doc_id) & (
+                Filter.by_property("toVersion").equal(pending)
+                | Filter.by_property("fromVersion").equal(pending)
+            ),
+            return_properties=["fromVersion"],
+        ):
+            uuid = str(obj.uuid)
+            if obj.properties.get("fromVersion") == pending:
+                if uuid not in keep:
+                    self.docs.data.delete_by_id(uuid)
+            elif uuid in keep:
+                reopened.append((uuid, {"toVersion": OPEN_VERSION}))
+        self._update_objects(reopened)
+
+    async def store_document(self,doc_id:str,chunks:ChunkTable, metadata: Dict):
+        """
+        Store document chunks in Weaviate as a new version of the document.
+
+        Chunk UUIDs are derived from their content, so chunks that are already
+        part of the active version are not rewritten; only their chunkId is
+        updated when their position changed. New chunks are written (upserted)
+        under the pending version and chunks that disappeared are retired.
+        Flipping the manifest then makes the new version visible at once. Until
+        then, and if anything fails, queries keep seeing the previous version.
+        Superseded chunks are garbage-collected in the background.
         """
         try:
-            # print(chunks)
-            await self.delete_document(document_id=doc_id)
-            # Store each chunk with its metadata
-            self.docs.data.insert_many(chunks)
+            async with self._document_locks[doc_id]:
+                # The write blocks on Weaviate (and on a local embedding model),
+                # so it runs on a worker thread while the lock is held on the loop
+                await asyncio.to_thread(self._write_version, doc_id, chunks)
+
+            task = asyncio.create_task(self._collect_garbage(doc_id))
+            self._gc_tasks.add(task)
+            task.add_done_callback(self._gc_tasks.discard)
         except Exception as e:
-            # print(e)
             raise Exception(f"Failed to store document in Weaviate: {str(e)}")
 
+    def _write_version(self, doc_id: str, chunks: ChunkTable):
+        """
+        The blocking body of `store_document`. Must be called under the document lock.
+        """
+        with stage("store.uuids"):
+            chunk_ids = chunks.object_uuids()
+        new_ids = set(chunk_ids)
+
+        manifest = self._get_manifest(doc_id)
+        if manifest is None:
+            # Publish version 0 first so the chunks below stay hidden
+            # until the flip: empty for a new document, or the chunks
+            # of a document stored before versioning
+            manifest = {"activeVersion": 0, "chunkIds": self._adopt_unversioned_chunks(doc_id)}
+        active = manifest["activeVersion"]
+        pending = active + 1
+        previous_ids = manifest["chunkIds"] or []
+        active_ids = set(previous_ids)
+
+        if manifest.get("pendingVersion"):
+            self._reset_interrupted_write(doc_id, pending, keep=new_ids)
+            # The failed write may already have renumbered reused chunks
+            previous_position = {}
+        else:
+            # Until the flip, queries across documents resolve this one through its manifest
+            self.versions.data.update(
+                uuid=generate_manifest_uuid(doc_id), properties={"pendingVersion": pending}
+            )
+            previous_position = {uuid: i for i, uuid in enumerate(previous_ids)}
+
+        new_rows = [i for i, uuid in enumerate(chunk_ids) if uuid not in active_ids]
+        vectors = None
+        if self.embedder is not None and new_rows:
+            # Only chunks that are not stored yet need a vector
+            with stage("store.embed"):
+                vectors = self.embedder.embed_documents([chunks.text(i) for i in new_rows])
+
+        # Apart from local embedding above, chunk text is only
+        # materialized while its batch is serialized
+        with stage("store.write"), self.docs.batch.fixed_size(
+            batch_size=WEAVIATE_BATCH_SIZE,
+            concurrent_requests=WEAVIATE_BATCH_CONCURRENCY,
+        ) as batch:
+            for row, i in enumerate(new_rows):
+                properties = chunks.properties(i)
+                properties["fromVersion"] = pending
+                properties["toVersion"] = OPEN_VERSION
+                batch.add_object(
+                    properties=properties,
+                    uuid=chunk_ids[i],
+                    vector={WEAVIATE_VECTOR_NAME: vectors[row]} if vectors is not None else None,
+                )
+
+        failed = self.docs.batch.failed_objects
+        if failed:
+            raise Exception(f"{len(failed)} chunks failed to import: {failed[0].message}")
+
+        with stage("store.flip"):
+            # Reused chunks keep their object but take their new position, and
+            # retired chunks stay visible to the active version until the flip
+            self._update_objects(
+                [
+                    (uuid, {"chunkId": str(i)}) for i, uuid in enumerate(chunk_ids)
+                    if uuid in active_ids and previous_position.get(uuid) != i
+                ]
+                + [(uuid, {"toVersion": pending}) for uuid in active_ids - new_ids]
+            )
+            self._save_manifest(doc_id, pending, chunk_ids, exists=True)
+
+    async def _collect_garbage(self, doc_id: str):
+        """
+        Delete chunks outside the active version of a document: retired chunks
+        and leftovers of interrupted writes.
+
+        Waits VERSION_GC_DELAY_SECONDS first so queries that resolved the
+        previous version just before the flip can still read it.
+        """
+        await asyncio.sleep(VERSION_GC_DELAY_SECONDS)
+        try:
+            async with self._document_locks[doc_id]:
+                manifest = await asyncio.to_thread(self._get_manifest, doc_id)
+                if manifest is None:
+                    return
+                active = manifest["activeVersion"]
+                await asyncio.to_thread(
+                    self.docs.data.delete_many,
+                    where=Filter.by_property("docId").equal(doc_id) & (
+                        Filter.by_property("toVersion").less_or_equal(active)
+                        | Filter.by_property("fromVersion").greater_than(active)
+                    ),
+                )
+        except Exception as e:
+            logger.warning("Version garbage collection failed for %s: %s", doc_id, e)
+
     async def delete_document(self, document_id: str):
         """
-        Delete all chunks belonging to a document.
+        Delete all chunks and the version manifest of a document.
         """
         try:
-            self.docs.data.delete_many(
-                where=weaviate.classes.query.Filter.by_property('docId').equal(document_id)
-            )
+            async with self._document_locks[document_id]:
+                await asyncio.to_thread(
+                    self.docs.data.delete_many,
+                    where=Filter.by_property('docId').equal(document_id),
+                )
+                await asyncio.to_thread(self.versions.data.delete_by_id, generate_manifest_uuid(document_id))
+                self._forget_unversioned(document_id)
         except Exception as e:
             raise Exception(f"Failed to delete document from Weaviate: {str(e)}")
 
     async def delete_collection(self):
         
         try:
-            self.client.collections.delete(name=WEAVIATE_CLASS_NAME)  
+            self.client.collections.delete(name=WEAVIATE_CLASS_NAME)
+            # Manifests would otherwise point at chunks that no longer exist
+            self.client.collections.delete(name=WEAVIATE_VERSION_CLASS_NAME)
+            with self._unversioned_lock:
+                self._unversioned_docs = frozenset()
         except Exception as e:
             raise Exception(f"Failed to delete collection from Weaviate: {str(e)}")
     
-    async def query(self, query_text: str, document_id: Optional[str] = None,enhance_query: Optional[str] = '' ,limit: int = 5):
+    async def query(self, query_text: str, document_id: Optional[str] = None,enhance_query: Optional[str] = '' ,limit: int = 5, generate: bool = True):
         """
         Query for relevant text chunks.
         """
+        # On a worker thread: the search blocks on Weaviate and, with a local
+        # embedding provider, on model inference
+        return await asyncio.to_thread(
+            self.search,
+            query_text=query_text,
+            document_id=document_id,
+            enhance_query=enhance_query,
+            limit=limit,
+            generate=generate,
+        )
+
+    def search(self, query_text: str, document_id: Optional[str] = None,enhance_query: Optional[str] = '' ,limit: int = 5, generate: bool = True, vector: Optional[List[float]] = None, filters=None) -> QueryResponse:
+        """
+        Run the hybrid search (and optionally the grouped generation) for a query.
+
+        This is the blocking part of `query`; it is safe to call from worker
+        threads, which share the single client connection. With a local
+        embedding provider the query vector is computed here unless `vector`
+        was already embedded by the caller. Likewise `filters` can carry a
+        `query_filter(document_id)` the caller already resolved.
+        """
         try:
-            
-            # Perform a hybrid search using the provided text query and document ID
-            answers = self.docs.generate.hybrid(
-                query= enhance_query if enhance_query else query_text,
-                filters=weaviate.classes.query.Filter.by_property('docId').equal(document_id),
+            search_text = enhance_query if enhance_query else query_text
+            if vector is None and self.embedder is not None:
+                with stage("search.embed"):
+                    vector = self.embedder.embed_query(search_text)
+            search_args = dict(
+                query=search_text,
+                vector=vector,
+                filters=filters if filters is not None else self.query_filter(document_id),
                 return_metadata=weaviate.classes.query.MetadataQuery(distance=True,score=True,),
-                grouped_task=query_text,
             )
+            # Perform a hybrid search using the provided text query and document ID
+            if generate:
+                answers = self.docs.generate.hybrid(grouped_task=query_text, **search_args)
+            else:
+                answers = self.docs.query.hybrid(**search_args)
       
             snippets = []
             
@@ -147,7 +598,7 @@ class WeaviateService:
                 )
           
             return QueryResponse(
-                result= str(answers.generated),
+                result= str(answers.generated) if generate else "",
                 snippets= snippets,
                 total_results=len(snippets)
             )
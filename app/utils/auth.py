@@ -0,0 +1,23 @@
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from config import ADMIN_API_KEY
+
+def require_admin(x_admin_key: Optional[str] = Header(None)):
+    """
+    FastAPI dependency guarding admin endpoints with the X-Admin-Key header.
+
+    Admin endpoints are disabled entirely while ADMIN_API_KEY is not configured.
+
+    Args:
+        x_admin_key (Optional[str]): The value of the X-Admin-Key header.
+
+    Raises:
+        HTTPException: 403 when admin access is disabled, 401 when the key is wrong.
+    """
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
@@ -1,4 +1,5 @@
 import hashlib
+import uuid
 
 def generate_document_id(file_name):
     """
@@ -13,3 +14,35 @@ def generate_document_id(file_name):
     hash_object = hashlib.sha256(file_name.encode())  # Create hash from file name
     document_id = hash_object.hexdigest()[:10]  # Use first 10 characters for brevity
     return document_id
+
+def generate_chunk_uuid(doc_id, page_no, chunk_type, chunk_data, occurrence=0):
+    """
+    Generate a deterministic object UUID for a chunk from its document and content.
+
+    The version is deliberately not part of the UUID: an unchanged chunk keeps
+    the same UUID across re-uploads, so it never has to be rewritten.
+
+    Args:
+        doc_id (str): The document the chunk belongs to.
+        page_no (str): The page the chunk was extracted from.
+        chunk_type (str): "text" or "image".
+        chunk_data (str): The chunk text.
+        occurrence (int): Distinguishes identical chunks within the same page.
+
+    Returns:
+        str: A UUIDv5 string.
+    """
+    namespace = uuid.uuid5(uuid.NAMESPACE_OID, doc_id)
+    return str(uuid.uuid5(namespace, f"{page_no}\x1f{chunk_type}\x1f{occurrence}\x1f{chunk_data}"))
+
+def generate_manifest_uuid(doc_id):
+    """
+    Generate the UUID of the version manifest object of a document.
+
+    Args:
+        doc_id (str): The document ID.
+
+    Returns:
+        str: A UUIDv5 string.
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"manifest\x1f{doc_id}"))